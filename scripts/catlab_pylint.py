@@ -0,0 +1,217 @@
+"""
+Run pylint on some files and write its report from the results of several runs
+
+pylint is run with a json output (or sonarjson, when it is the requested
+format) and the results are split per file. The report is then written in
+the requested format from the results of the files, in the order of the
+files, as a single pylint run on all the files would have written it:
+    - text, with the given --msg-template
+    - json
+    - sonarjson
+
+The messages that depend on several modules (cyclic-import, duplicate-code)
+are computed by a dedicated run on all the files, after the others, as
+pylint emits them at the end of a run.
+"""
+
+import heapq
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# pylint messages that depend on several modules
+CROSS_MODULE_MESSAGES = {"R0401": "cyclic-import", "R0801": "duplicate-code"}
+
+
+def option_value(options, name, default=None):
+    """
+    :param options: command line options
+    :param name: option name with its trailing =, e.g. "--rcfile="
+    :param default: value if the option is not given
+    :returns: value of the last occurrence of the option
+    """
+    values = [option[len(name):] for option in options if option.startswith(name)]
+    return values[-1] if values else default
+
+
+def normalize(path) -> str:
+    """
+    :returns: the absolute path of a file, tools do not all report files as they were given
+    """
+    return os.path.normpath(os.path.abspath(path))
+
+
+def rcfile_output_format(rcfile) -> str:
+    """
+    :returns: the last output-format set in a pylintrc (the CNES ones set sonarjson), default: text
+    """
+    output_format = "text"
+    if rcfile:
+        with open(rcfile, "r", encoding="utf8") as f:
+            for line in f:
+                match = re.match(r"\s*output-format\s*=\s*(\S+)", line)
+                if match:
+                    output_format = match.group(1)
+    return output_format
+
+
+def file_size(path) -> int:
+    """
+    :returns: size of a file, 0 if it cannot be read (pylint reports it)
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def shard(files, count):
+    """
+    Split files into shards of balanced total size: the largest files are
+    given first, each one to the smallest shard so far.
+
+    :param files: files to split
+    :param count: maximum number of shards
+    :returns: list of non-empty shards, the files of a shard keep their relative order
+    """
+    count = max(1, min(count, len(files)))
+    heap = [(0, index) for index in range(count)]
+    shard_of = {}
+    sizes = {file: file_size(file) for file in files}
+    for file in sorted(files, key=lambda file: (-sizes[file], file)):
+        size, index = heapq.heappop(heap)
+        shard_of[file] = index
+        heapq.heappush(heap, (size + sizes[file], index))
+    shards = [[] for _ in range(count)]
+    for file in files:
+        shards[shard_of[file]].append(file)
+    return [files for files in shards if files]
+
+
+class Pylint:
+    """
+    pylint results are kept as the messages of its json output,
+    or as the issues of its sonarjson output.
+
+    :param options: options of pylint, given by the user
+    """
+
+    def __init__(self, options):
+        self.options = list(options)
+        self.output_format = option_value(self.options, "--output-format=",
+            rcfile_output_format(option_value(self.options, "--rcfile=")))
+        self.msg_template = option_value(self.options, "--msg-template=",
+            "{path}:{line}:{column}: {msg_id}: {msg} ({symbol})")
+        # The options without the ones that only change the report
+        self.lint_options = [option for option in self.options
+            if not option.startswith(("--output-format=", "--msg-template=", "--score=", "--reports="))]
+        self._cross_module_messages = None
+
+    @property
+    def cross_module_messages(self):
+        """
+        :returns: ids of the cross-module messages enabled by the configuration
+        """
+        if self._cross_module_messages is None:
+            output = subprocess.run(["pylint", *self.lint_options, "--list-msgs-enabled"],
+                check=True, capture_output=True, text=True).stdout
+            enabled = output.split("Disabled messages:")[0]
+            self._cross_module_messages = [msg_id for msg_id in CROSS_MODULE_MESSAGES
+                if f"({msg_id})" in enabled]
+        return self._cross_module_messages
+
+    def lint(self, files, extra_options=()):
+        """
+        :returns: results of a single pylint process on the files
+        """
+        output_format = "sonarjson" if self.output_format == "sonarjson" else "json"
+        output = subprocess.run(["pylint", "--exit-zero", "-r", "n", "--score=n",
+            f"--output-format={output_format}", *self.lint_options, "--jobs=1", *extra_options, *files],
+            check=True, capture_output=True, text=True).stdout
+        results = json.loads(output) if output.strip() else []
+        return results["issues"] if output_format == "sonarjson" else results
+
+    def path(self, result) -> str:
+        """
+        :returns: file of a result
+        """
+        if self.output_format == "sonarjson":
+            return result["primaryLocation"]["filePath"]
+        return result["path"]
+
+    def run(self, files, jobs=1) -> dict:
+        """
+        Run pylint on some files, without the cross-module messages, on balanced
+        shards of the files run at the same time.
+
+        :param files: files to analyse
+        :param jobs: maximum number of pylint processes
+        :returns: dictionary {normalized path of a file: list of results of the file}
+        """
+        disabled = [f"--disable={msg_id}" for msg_id in CROSS_MODULE_MESSAGES]
+        shards = shard(files, jobs)
+        with ThreadPoolExecutor(max_workers=len(shards) or 1) as executor:
+            shard_results = list(executor.map(lambda files: self.lint(files, disabled), shards))
+        per_file = {}
+        for results in shard_results:
+            for result in results:
+                per_file.setdefault(normalize(self.path(result)), []).append(result)
+        return per_file
+
+    def cross_module_results(self, files):
+        """
+        The cross-module messages are computed on all the files,
+        with only their checkers enabled.
+
+        :returns: results of the cross-module messages
+        """
+        if not files or not self.cross_module_messages:
+            return []
+        return self.lint(files, ["--disable=all", f"--enable={','.join(self.cross_module_messages)}"])
+
+    def merge(self, files, per_file, cross_module=None):
+        """
+        :param files: analysed files, in the order they were given
+        :param per_file: results per normalized path (see run)
+        :param cross_module: (optional) results of the cross-module messages,
+                             default: computed by cross_module_results
+        :returns: list of results in the order of a single pylint run on the files
+        """
+        per_file = dict(per_file)
+        results = []
+        for file in files:
+            results += per_file.pop(normalize(file), [])
+        # Results of other files, e.g. a module that cannot be found
+        for others in per_file.values():
+            results += others
+        if cross_module is None:
+            cross_module = self.cross_module_results(files)
+        return results + cross_module
+
+    def render(self, results) -> str:
+        """
+        Write the report of pylint.
+
+        :param results: list of results, in the order of the files
+        :returns: content of the report
+        """
+        if self.output_format == "sonarjson":
+            return json.dumps({"issues": results}, indent=4) + "\n"
+        if self.output_format == "json":
+            return json.dumps(results, indent=4) + "\n"
+        lines = []
+        module = None
+        for message in results:
+            if message["module"] != module:
+                module = message["module"]
+                lines.append(f"************* Module {module}")
+            lines.append(self.msg_template.format(
+                path=message["path"], abspath=os.path.abspath(message["path"]),
+                module=message["module"], obj=message["obj"],
+                line=message["line"], column=message["column"],
+                end_line=message.get("endLine"), end_column=message.get("endColumn"),
+                msg_id=message["message-id"], symbol=message["symbol"], msg=message["message"],
+                C=message["message-id"][0], category=message["type"]))
+        return "".join(f"{line}\n" for line in lines)
@@ -0,0 +1,269 @@
+"""
+Resources available to the container and how they are shared
+
+The CPU quota and the memory limit are read from the cgroup of the
+container (v2, or v1 as a fallback), so that tools are not sized after
+the CPUs and memory of the whole host. SONAR_GOVERNOR_CPUS and
+SONAR_GOVERNOR_MEMORY (in MB) replace them.
+
+The governor hands them out to what runs at the same time: the analyses of
+the batch mode, and in each analysis the tools of the pre-analysis (they
+run together) then the JVM of the sonar-scanner. The memory only bounds the
+number of processes and the heap of the JVM, it is not a limit enforced on
+the tools. The settings already in the environment (SONAR_BATCH_JOBS,
+PYLINT_JOBS, CPPCHECK_JOBS and the JVM options of SONAR_SCANNER_OPTS) prevail.
+
+Usage:
+    python3 -m container_limits cpus
+    python3 -m container_limits memory
+    python3 -m container_limits batch-jobs
+    python3 -m container_limits jobs {pylint,cppcheck}
+    python3 -m container_limits jvm-options [--analyses N] [USER JVM OPTIONS]
+    python3 -m container_limits governor [--batch] [--tools TOOLS] [USER JVM OPTIONS]
+        prints the settings as NAME=VALUE lines (SONAR_SCANNER_OPTS includes
+        the options of the user), for the entrypoint to export them
+"""
+
+import math
+import os
+import re
+import sys
+
+
+def _read(path):
+    """
+    :returns: the stripped content of a file or None if it cannot be read
+    """
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_quota():
+    """
+    :returns: number of CPUs allowed by the cgroup CPU quota (may be fractional), None if unlimited
+    """
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, period = cpu_max.split()
+        return None if quota == "max" else int(quota) / int(period)
+    # cgroup v1: a quota of -1 means unlimited
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") or _read("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us") or _read("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def memory_limit():
+    """
+    :returns: memory limit of the cgroup in bytes, None if unlimited
+    """
+    # cgroup v2: "max" if unlimited
+    memory_max = _read("/sys/fs/cgroup/memory.max")
+    if memory_max:
+        return None if memory_max == "max" else int(memory_max)
+    # cgroup v1: a huge value (rounded down 2^63) if unlimited
+    limit = _read("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    if limit and int(limit) < 1 << 60:
+        return int(limit)
+    return None
+
+
+def available_memory() -> int:
+    """
+    :returns: memory the container can use in bytes: its limit or the memory of the host
+    """
+    if os.environ.get("SONAR_GOVERNOR_MEMORY"):
+        return int(os.environ["SONAR_GOVERNOR_MEMORY"]) << 20
+    total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    limit = memory_limit()
+    return total if limit is None else min(total, limit)
+
+
+def available_cpus() -> int:
+    """
+    :returns: number of CPUs the container can use, at least 1
+    """
+    if os.environ.get("SONAR_GOVERNOR_CPUS"):
+        return max(1, int(os.environ["SONAR_GOVERNOR_CPUS"]))
+    cpus = len(os.sched_getaffinity(0))
+    quota = cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+# Share of the memory given to the heap of the JVMs, the rest is left to
+# their other memory areas and to the embedded tools
+JVM_HEAP_SHARE = 0.5
+JVM_MIN_HEAP_MB = 256
+# Share of the memory of the host given to the heap by the JVM when the
+# container has no memory limit (its MaxRAMPercentage default)
+JVM_DEFAULT_RAM_PERCENTAGE = 25
+# Memory of an analysis of the batch mode below which fewer analyses run at the same time
+ANALYSIS_MIN_MB = 1024
+# Tools of the pre-analysis that run several processes: the environment
+# variable of their number of processes and the memory of each process
+TOOL_JOBS = {"pylint": "PYLINT_JOBS", "cppcheck": "CPPCHECK_JOBS"}
+TOOL_PROCESS_MB = {"pylint": 512, "cppcheck": 256}
+
+
+def log(message):
+    """
+    Print a decision of the governor on stderr
+    """
+    sys.stderr.write(f"[governor] {message}\n")
+
+
+def batch_jobs() -> int:
+    """
+    :returns: number of analyses of the batch mode running at the same time
+              (SONAR_BATCH_JOBS), default: one per CPU, with at least
+              ANALYSIS_MIN_MB of memory each
+    """
+    if os.environ.get("SONAR_BATCH_JOBS"):
+        return max(1, int(os.environ["SONAR_BATCH_JOBS"]))
+    return max(1, min(available_cpus(), available_memory() // (ANALYSIS_MIN_MB << 20)))
+
+
+def tool_jobs(tool, analyses=1, tools=None) -> int:
+    """
+    :param tool: tool of TOOL_JOBS
+    :param analyses: number of analyses running at the same time
+    :param tools: tools running at the same time in an analysis, default: only this one
+    :returns: number of processes of the tool (its environment variable of
+              TOOL_JOBS), default: its share of the CPUs of an analysis
+              (every tool running at the same time gets one), bounded so that
+              its share of the memory gives TOOL_PROCESS_MB to each process
+    """
+    if os.environ.get(TOOL_JOBS[tool]):
+        return max(1, int(os.environ[TOOL_JOBS[tool]]))
+    sharing = analyses * len(tools or [tool])
+    return max(1, min(available_cpus() // sharing,
+        available_memory() // sharing // (TOOL_PROCESS_MB[tool] << 20)))
+
+
+def size_in_bytes(size: str) -> int:
+    """
+    :param size: size of a JVM option, e.g. 512m or 1g
+    :returns: the size in bytes
+    """
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+    if size[-1:].lower() in units:
+        return int(size[:-1]) * units[size[-1].lower()]
+    return int(size)
+
+
+def jvm_options(user_options="", analyses=1):
+    """
+    Size the JVM of the sonar-scanner after the resources of the container.
+    The heap is only sized when the memory is limited (cgroup limit or
+    SONAR_GOVERNOR_MEMORY), otherwise the default share of the memory of the
+    host is split between the analyses. The settings given by the user are
+    kept: the heap is not sized if a maximum heap is given and is at least
+    the initial heap if one is given, the garbage collector is not chosen if
+    one is.
+
+    :param user_options: JVM options given by the user (SONAR_SCANNER_OPTS)
+    :param analyses: number of analyses running at the same time
+    :returns: list of JVM options
+    """
+    user_options = user_options.split()
+    options = []
+    cpus = max(1, available_cpus() // analyses)
+    user_heap = any(option.startswith(("-Xmx", "-XX:MaxHeapSize=", "-XX:MaxRAM")) for option in user_options)
+    if not user_heap and (memory_limit() is not None or os.environ.get("SONAR_GOVERNOR_MEMORY")):
+        heap = max(int(available_memory() * JVM_HEAP_SHARE / analyses) >> 20, JVM_MIN_HEAP_MB)
+        # The JVM does not start with an initial heap larger than the maximum one
+        for option in user_options:
+            if option.startswith(("-Xms", "-XX:InitialHeapSize=")):
+                initial = option[len("-Xms"):] if option.startswith("-Xms") else option.partition("=")[2]
+                heap = max(heap, -(-size_in_bytes(initial) >> 20))
+        options.append(f"-Xmx{heap}m")
+    elif not user_heap and analyses > 1:
+        options.append(f"-XX:MaxRAMPercentage={JVM_DEFAULT_RAM_PERCENTAGE / analyses:.1f}")
+    # The threads of the JVM (compiler, common pool...) are sized after its share of the CPUs
+    if not any(option.startswith("-XX:ActiveProcessorCount=") for option in user_options):
+        options.append(f"-XX:ActiveProcessorCount={cpus}")
+    if not any(re.match(r"-XX:\+Use\w+GC$", option) for option in user_options):
+        # An analysis is a batch job: the throughput matters, not the pauses
+        if cpus == 1:
+            options.append("-XX:+UseSerialGC")
+        else:
+            options += ["-XX:+UseParallelGC", f"-XX:ParallelGCThreads={cpus}"]
+    return options
+
+
+def governor(batch=False, tools=(), user_options="") -> dict:
+    """
+    Hand out the CPUs and the memory of the container and log the decisions.
+
+    :param batch: True for the batch mode, whose analyses run at the same time
+    :param tools: tools of the pre-analysis, they run at the same time
+    :param user_options: JVM options given by the user (SONAR_SCANNER_OPTS)
+    :returns: the settings, as environment variables
+    """
+    cpus, memory = available_cpus(), available_memory()
+    if os.environ.get("SONAR_GOVERNOR_CPUS"):
+        cpus_source = "SONAR_GOVERNOR_CPUS"
+    elif cpu_quota() is not None:
+        cpus_source = f"cgroup CPU quota of {cpu_quota():g}"
+    else:
+        cpus_source = "no CPU quota"
+    if os.environ.get("SONAR_GOVERNOR_MEMORY"):
+        memory_source = "SONAR_GOVERNOR_MEMORY"
+    else:
+        memory_source = "no memory limit" if memory_limit() is None else "cgroup memory limit"
+    log(f"{cpus} CPU(s) ({cpus_source}) and {memory >> 20} MB ({memory_source})")
+    settings = {}
+    analyses = 1
+    if batch:
+        analyses = settings["SONAR_BATCH_JOBS"] = batch_jobs()
+        source = " (SONAR_BATCH_JOBS)" if os.environ.get("SONAR_BATCH_JOBS") else ""
+        log(f"{analyses} analyses at a time{source}, "
+            f"{max(1, cpus // analyses)} CPU(s) and {memory // analyses >> 20} MB each")
+    tools = [tool for tool in tools if tool]
+    for tool in (tool for tool in tools if tool in TOOL_JOBS):
+        settings[TOOL_JOBS[tool]] = tool_jobs(tool, analyses, tools)
+        source = f" ({TOOL_JOBS[tool]})" if os.environ.get(TOOL_JOBS[tool]) else ""
+        log(f"{tool}: {settings[TOOL_JOBS[tool]]} process(es) per analysis{source}")
+    # The JVM options are printed by the entrypoint
+    settings["SONAR_SCANNER_OPTS"] = " ".join(jvm_options(user_options, analyses) + user_options.split())
+    return settings
+
+
+def main(argv):
+    if argv[:1] == ["cpus"]:
+        print(available_cpus())
+    elif argv[:1] == ["memory"]:
+        print(available_memory())
+    elif argv[:1] == ["batch-jobs"]:
+        print(batch_jobs())
+    elif argv[:1] == ["jobs"] and argv[1:2] and argv[1] in TOOL_JOBS:
+        print(tool_jobs(argv[1]))
+    elif argv[:1] == ["jvm-options"]:
+        argv = argv[1:]
+        analyses = 1
+        if argv[:1] == ["--analyses"]:
+            analyses, argv = max(1, int(argv[1])), argv[2:]
+        print(" ".join(jvm_options(" ".join(argv), analyses)))
+    elif argv[:1] == ["governor"]:
+        argv = argv[1:]
+        batch = argv[:1] == ["--batch"]
+        argv = argv[1:] if batch else argv
+        tools = []
+        if argv[:1] == ["--tools"]:
+            tools, argv = argv[1].split(","), argv[2:]
+        for name, value in governor(batch, tools, " ".join(argv)).items():
+            print(f"{name}={value}")
+    else:
+        sys.exit("usage: python3 -m container_limits {cpus,memory,batch-jobs,jobs {pylint,cppcheck},"
+            "jvm-options [--analyses N] [USER JVM OPTIONS],governor [--batch] [--tools TOOLS] [USER JVM OPTIONS]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
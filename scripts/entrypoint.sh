@@ -13,23 +13,153 @@ add_env_var_as_env_prop() {
   fi
 }
 
+# Print the value of a property given to sonar-scanner (the last one prevails)
+# Usage: scanner_property NAME DEFAULT ARGS...
+scanner_property() {
+  local value="$2"
+  local arg
+  for arg in "${@:3}"; do
+    if [[ "$arg" = "-D$1="* ]]; then
+      value="${arg#"-D$1="}"
+    fi
+  done
+  echo "$value"
+}
+
+# Print the base directory of the project given to sonar-scanner
+project_base_dir() {
+  scanner_property sonar.projectBaseDir "${SONAR_PROJECT_BASE_DIR:-.}" "$@"
+}
+
+# Succeed if the analysis is a pull request or a branch analysis, given on
+# the command line or in the sonar-project.properties of the project
+# Usage: pull_request_or_branch ARGS...
+pull_request_or_branch() {
+  local properties
+  properties="$(project_base_dir "$@")/sonar-project.properties"
+  [ -n "$(scanner_property sonar.pullrequest.key "" "$@")$(scanner_property sonar.branch.name "" "$@")" ] \
+    || { [ -f "$properties" ] \
+      && grep -qE '^[[:space:]]*sonar\.(pullrequest\.key|branch\.name)[[:space:]]*[=:]' "$properties"; }
+}
+
+# Tools whose reports are converted to a generic external issues report (see
+# external-issues), by default the tools run before the analysis whose report
+# is not imported by a plugin
+if [ -z "${SONAR_EXTERNAL_ISSUES+x}" ]; then
+  SONAR_EXTERNAL_ISSUES=""
+  IFS=, read -ra tools <<< "${SONAR_PREANALYSIS:-}"
+  for tool in "${tools[@]}"; do
+    if [[ "$tool" = 'shellcheck' ]] || [[ "$tool" = 'hadolint' ]]; then
+      SONAR_EXTERNAL_ISSUES+="${SONAR_EXTERNAL_ISSUES:+,}$tool"
+    fi
+  done
+fi
+export SONAR_EXTERNAL_ISSUES
+
+# Commands are run through sonar-telemetry if telemetry events are asked for
+declare -a run=()
+if [ -n "${SONAR_TELEMETRY:-}" ]; then
+  run=(sonar-telemetry)
+fi
+
 # if nothing is passed, assume we want to run sonar-scanner
 if [[ "$#" == 0 ]]; then
   set -- sonar-scanner
 fi
 
+# warm-cache fills the cache of the sonar-scanner (see sonar-cache)
+if [[ "$1" = 'warm-cache' ]]; then
+  set -- sonar-cache warm "${@:2}"
+fi
+
 # if first arg looks like a flag, assume we want to run sonar-scanner with flags
 if [[ "${1#-}" != "${1}" ]] || [[ -z "$(command -v "${1}")" ]]; then
   set -- sonar-scanner "$@"
 fi
 
-if [[ "$1" = 'sonar-scanner' ]]; then
+if [[ "$1" = 'sonar-scanner' ]] || [[ "$1" = 'sonar-scanner-batch' ]]; then
   add_env_var_as_env_prop "${SONAR_LOGIN:-}" "sonar.login"
   add_env_var_as_env_prop "${SONAR_PASSWORD:-}" "sonar.password"
-  add_env_var_as_env_prop "${SONAR_PROJECT_BASE_DIR:-}" "sonar.projectBaseDir"
+  # In batch mode, each project has its own base directory
+  if [[ "$1" = 'sonar-scanner' ]]; then
+    add_env_var_as_env_prop "${SONAR_PROJECT_BASE_DIR:-}" "sonar.projectBaseDir"
+  fi
+  # Import the converted reports (the ones of sonar.externalIssuesReportPaths
+  # are merged into it) instead of importing them with the plugins
+  if [ -n "$SONAR_EXTERNAL_ISSUES" ]; then
+    args+=("-Dsonar.externalIssuesReportPaths=external-issues.json")
+    if [[ ",$SONAR_EXTERNAL_ISSUES," = *,cppcheck,* ]]; then
+      args+=("-Dsonar.cxx.cppcheck.reportPaths=")
+    fi
+    if [[ ",$SONAR_EXTERNAL_ISSUES," = *,pylint,* ]]; then
+      args+=("-Dsonar.python.pylint.reportPaths=")
+    fi
+  fi
+  # Only analyse the files changed since SONAR_DIFF_BASE, unless sonar-diff
+  # asks for a full scan (exit code 3); the analysis of the main branch
+  # must see all the files, or the issues of the others would be closed
+  if [[ "$1" = 'sonar-scanner' ]] && [ -n "${SONAR_DIFF_BASE:-}" ] && ! pull_request_or_branch "${@:2}"; then
+    echo "[diff] Full scan: neither sonar.pullrequest.key nor sonar.branch.name is set" >&2
+  elif [[ "$1" = 'sonar-scanner' ]] && [ -n "${SONAR_DIFF_BASE:-}" ]; then
+    changed_files="$(mktemp)"
+    status=0
+    (cd "$(project_base_dir "${@:2}")" && sonar-diff "$SONAR_DIFF_BASE") > "$changed_files" || status=$?
+    if [ "$status" -eq 0 ]; then
+      export SONAR_PREANALYSIS_FILES="$changed_files"
+      # Without any changed file, a pattern that matches no file
+      inclusions="$(paste -sd, "$changed_files")"
+      args+=("-Dsonar.inclusions=${inclusions:-no-changed-file}")
+    elif [ "$status" -ne 3 ]; then
+      exit "$status"
+    fi
+  fi
   if [ ${#args[@]} -ne 0 ]; then
-    set -- sonar-scanner "${args[@]}" "${@:2}"
+    set -- "$1" "${args[@]}" "${@:2}"
+  fi
+  # Hand out the CPUs and the memory of the container to the analyses of the
+  # batch mode, the tools of the pre-analysis and the JVM of the sonar-scanner
+  # (see container_limits); the settings given by the user prevail
+  governor_options=(--tools "${SONAR_PREANALYSIS:-}")
+  if [[ "$1" = 'sonar-scanner-batch' ]]; then
+    governor_options=(--batch "${governor_options[@]}")
+  fi
+  settings="$(python3 -m container_limits governor "${governor_options[@]}" "${SONAR_SCANNER_OPTS:-}")"
+  while IFS= read -r setting; do
+    export "${setting?}"
+  done <<< "$settings"
+  # Use the class data sharing archive of the image, the options given by
+  # the user come last so that they prevail
+  cds_archive="${SONAR_SCANNER_HOME:-/opt/sonar-scanner}/lib/sonar-scanner.jsa"
+  if [ -f "$cds_archive" ] && [[ "$SONAR_SCANNER_OPTS" != *-Xshare* ]] \
+      && [[ "$SONAR_SCANNER_OPTS" != *SharedArchiveFile* ]]; then
+    SONAR_SCANNER_OPTS="-XX:SharedArchiveFile=$cds_archive -Xlog:cds=off,cds+dynamic=off $SONAR_SCANNER_OPTS"
+  fi
+  # Remove the corrupted files of the cache, the scanner downloads them again
+  if [ "${SONAR_CACHE_VERIFY:-yes}" = "yes" ]; then
+    sonar-cache verify --quiet
+  fi
+  # Record the files of the cache used by the server if asked to (see
+  # sonar-cache evict), it costs a request to the server
+  if [ "${SONAR_CACHE_RECORD:-no}" = "yes" ]; then
+    token="$(scanner_property sonar.token "$(scanner_property sonar.login "${SONAR_TOKEN:-}" "$@")" "$@")"
+    SONAR_TOKEN="$token" sonar-cache record --quiet \
+      "$(scanner_property sonar.host.url "${SONAR_HOST_URL:-}" "$@")" || true
+  fi
+  # Run the embedded tools first if asked to and convert their reports
+  # (the batch mode does it for each project)
+  if [[ "$1" = 'sonar-scanner' ]]; then
+    base_dir="$(project_base_dir "${@:2}")"
+    if [ -n "${SONAR_PREANALYSIS:-}" ]; then
+      "${run[@]}" sonar-preanalysis "$base_dir"
+    fi
+    if [ -n "$SONAR_EXTERNAL_ISSUES" ]; then
+      IFS=, read -ra tools <<< "$SONAR_EXTERNAL_ISSUES"
+      (cd "$base_dir" && "${run[@]}" external-issues --properties sonar-project.properties "${tools[@]}")
+    fi
   fi
+  # Printed right before the sonar-scanner starts (the benchmark times the
+  # start-up of the JVM from it)
+  echo "[entrypoint] JVM options: $SONAR_SCANNER_OPTS" >&2
 fi
 
-exec "$@"
+exec "${run[@]}" "$@"
@@ -0,0 +1,182 @@
+"""
+Timings of the analyses and of the embedded tools, for the benchmark mode of the tests
+
+Each run of a scenario (an analysis of a language fixture, a run of a tool)
+gives timings in milliseconds:
+    - container_start_ms: from the request to run the container to its start
+    - entrypoint_ms: from the start of the container to the log of the entrypoint,
+                     printed right before the sonar-scanner starts (after the
+                     verification of its cache and the pre-analysis)
+    - jvm_bootstrap_ms: from the log of the entrypoint to the first log of the sonar-scanner
+    - plugin_cache_ms: check (and download) of the plugins, as logged by the sonar-scanner
+    - sensor:<sensor>_ms: time of each sensor, as logged by the sonar-scanner
+    - upload_ms: upload of the analysis report, as logged by the sonar-scanner
+    - ce_queue_ms and ce_processing_ms: wait and processing of the report by the server
+    - total_ms: from the request to run the container to its end
+
+The timings of the runs are summarized by their median and percentiles,
+written as JSON and compared with a baseline: a timing is a regression
+when its median is slower than the one of the baseline by more than a
+relative threshold and by more than a minimum delta (to ignore noise).
+"""
+
+import fnmatch
+import json
+import math
+import re
+import statistics
+from datetime import datetime, timezone
+
+SENSOR_TIMING = re.compile(r"INFO\s+Sensor (.+?) \(done\) \| time=(\d+)ms")
+PLUGIN_CACHE_TIMING = re.compile(r"INFO\s+Load/download plugins \(done\) \| time=(\d+)ms")
+UPLOAD_TIMING = re.compile(r"INFO\s+Analysis report uploaded in (\d+)ms")
+ENTRYPOINT_LOG = "[entrypoint]"
+SCANNER_LOG = re.compile(r"\bINFO\b")
+
+
+def parse_time(value: str) -> float:
+    """
+    :param value: time written by docker (e.g. 2024-05-02T08:15:42.123456789Z)
+                  or by SonarQube (e.g. 2024-05-02T10:15:42+0200)
+    :returns: seconds since the epoch
+    """
+    match = re.match(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$", value)
+    seconds = datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    offset = match.group(3)
+    if offset and offset != "Z":
+        sign = -1 if offset[0] == "-" else 1
+        seconds -= sign * (int(offset[1:3]) * 3600 + int(offset[-2:]) * 60)
+    return seconds + float(f"0.{match.group(2) or 0}")
+
+
+def scanner_timings(output: str) -> dict:
+    """
+    :param output: output of the sonar-scanner
+    :returns: timings logged by the sonar-scanner
+    """
+    timings = {}
+    for sensor, duration in SENSOR_TIMING.findall(output):
+        timings[f"sensor:{sensor}_ms"] = timings.get(f"sensor:{sensor}_ms", 0) + int(duration)
+    match = PLUGIN_CACHE_TIMING.search(output)
+    if match:
+        timings["plugin_cache_ms"] = int(match.group(1))
+    match = UPLOAD_TIMING.search(output)
+    if match:
+        timings["upload_ms"] = int(match.group(1))
+    return timings
+
+
+def container_timings(requested_at: float, state: dict, logs: str) -> dict:
+    """
+    :param requested_at: time (seconds since the epoch) of the request to run the container
+    :param state: State of the inspected container
+    :param logs: logs of the container with their docker timestamps
+    :returns: timings of the start of the container and of the sonar-scanner
+    """
+    started_at = parse_time(state["StartedAt"])
+    timings = {
+        "container_start_ms": round((started_at - requested_at) * 1000),
+        "total_ms": round((parse_time(state["FinishedAt"]) - requested_at) * 1000),
+    }
+    entrypoint_at = None
+    for line in logs.splitlines():
+        timestamp, _, message = line.partition(" ")
+        if entrypoint_at is None and message.startswith(ENTRYPOINT_LOG):
+            entrypoint_at = parse_time(timestamp)
+            timings["entrypoint_ms"] = round((entrypoint_at - started_at) * 1000)
+        elif entrypoint_at is not None and SCANNER_LOG.search(message):
+            timings["jvm_bootstrap_ms"] = round((parse_time(timestamp) - entrypoint_at) * 1000)
+            break
+    return timings
+
+
+def percentile(values, rank: float) -> float:
+    """
+    :param rank: percentile between 0 and 100
+    :returns: percentile of the values, with a linear interpolation
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * rank / 100
+    low, high = math.floor(position), math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(samples) -> dict:
+    """
+    :param samples: list of values of a timing
+    :returns: statistics of the values
+    """
+    return {
+        "runs": len(samples),
+        "median": statistics.median(samples),
+        "p90": round(percentile(samples, 90), 1),
+        "p95": round(percentile(samples, 95), 1),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+class Recorder:
+    """
+    Timings of the runs of the scenarios of a benchmark
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, scenario: str, timings: dict):
+        """
+        Record the timings of a run of a scenario
+        """
+        for metric, value in timings.items():
+            self.samples.setdefault(scenario, {}).setdefault(metric, []).append(value)
+
+    def results(self, **metadata) -> dict:
+        """
+        :param metadata: information about the benchmark, e.g. the image
+        :returns: statistics of the timings of each scenario
+        """
+        return {
+            **metadata,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "scenarios": {scenario: {metric: summarize(samples) for metric, samples in sorted(metrics.items())}
+                for scenario, metrics in sorted(self.samples.items())},
+        }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """
+    Compare the medians of the results with the ones of a baseline.
+
+    The baseline can set the threshold of some timings with a "thresholds"
+    dictionary {"<scenario>/<metric> pattern": relative threshold}, e.g.
+    {"language:*/sensor:*": 0.5}.
+
+    :param threshold: default relative threshold, e.g. 0.2 for 20% slower
+    :param min_delta_ms: minimum slowdown in milliseconds to be a regression
+    :returns: descriptions of the regressions
+    """
+    thresholds = baseline.get("thresholds", {})
+    regressions = []
+    for scenario, metrics in results["scenarios"].items():
+        for metric, stats in metrics.items():
+            reference = baseline.get("scenarios", {}).get(scenario, {}).get(metric)
+            if reference is None:
+                continue
+            name = f"{scenario}/{metric}"
+            limit = next((value for pattern, value in thresholds.items() if fnmatch.fnmatchcase(name, pattern)),
+                threshold)
+            delta = stats["median"] - reference["median"]
+            if delta > min_delta_ms and delta > reference["median"] * limit:
+                regressions.append(f"{name}: median {stats['median']}ms instead of {reference['median']}ms "
+                    f"(+{delta / max(reference['median'], 1):.0%}, threshold {limit:.0%})")
+    return regressions
+
+
+def write(path, data: dict):
+    """
+    Write results (or a baseline) as JSON
+    """
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,143 @@
+"""
+Compare two images of the sonar-scanner: usually the default one and the slim one.
+
+For each image, it measures:
+    - its size and number of layers
+    - the time to get it on a runner that does not have it: a pull from the
+      registry (--pull) or else a load of the saved image
+    - the time from the start of a container to the end of `sonar-scanner --version`
+      (median over several runs)
+and checks that both images embed the same versions of the tools.
+
+Usage: python compare_images.py [--runs N] [--pull] [--json FILE] REFERENCE_IMAGE CANDIDATE_IMAGE
+
+It exits with a non-zero code if the tools differ or if the candidate image
+is not smaller than the reference one.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+import docker
+
+# Commands whose output must be the same in both images
+VERSION_COMMANDS = (
+    "sonar-scanner --version",
+    "pylint --version",
+    "cppcheck --version",
+    "shellcheck --version",
+    "hadolint --version",
+    "git --version",
+)
+
+
+def run(docker_client, image: str, cmd: str) -> str:
+    """
+    :returns: the output of a command run in a new container of the image
+    """
+    return docker_client.containers.run(image, cmd, auto_remove=True, stderr=True).decode("utf-8")
+
+
+def cold_get_time(docker_client, image: str, pull: bool) -> float:
+    """
+    Remove the image and get it again.
+
+    :param pull: pull the image from its registry, else load it from a saved archive
+    :returns: time to get the image in seconds
+    """
+    if pull:
+        docker_client.images.remove(image, force=True)
+        start = time.perf_counter()
+        docker_client.images.pull(image)
+        return time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "image.tar")
+        with open(archive, "wb") as f:
+            for chunk in docker_client.images.get(image).save(named=True):
+                f.write(chunk)
+        docker_client.images.remove(image, force=True)
+        start = time.perf_counter()
+        with open(archive, "rb") as f:
+            docker_client.images.load(f)
+        return time.perf_counter() - start
+
+
+def start_up_times(docker_client, image: str, runs: int) -> list:
+    """
+    :returns: times in seconds from the start of a container to the end of `sonar-scanner --version`
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run(docker_client, image, "sonar-scanner --version")
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure(docker_client, image: str, runs: int, pull: bool) -> dict:
+    """
+    :returns: measures of an image
+    """
+    cold_get = cold_get_time(docker_client, image, pull)
+    docker_image = docker_client.images.get(image)
+    start_up = start_up_times(docker_client, image, runs)
+    return {
+        "image": image,
+        "size_mb": round(docker_image.attrs["Size"] / 1e6, 1),
+        "layers": len(docker_image.attrs["RootFS"]["Layers"]),
+        "cold_get_s": round(cold_get, 2),
+        "first_start_up_s": round(start_up[0], 2),
+        "median_start_up_s": round(statistics.median(start_up), 2),
+    }
+
+
+def tool_differences(docker_client, reference: str, candidate: str) -> list:
+    """
+    :returns: the version commands whose output differ between the images
+    """
+    differences = []
+    for cmd in VERSION_COMMANDS:
+        # Without the logs of the governor, of the JVM options and the timestamps of the sonar-scanner
+        outputs = [[re.sub(r"^\d{2}:\d{2}:\d{2}\.\d{3} ", "", line)
+            for line in run(docker_client, image, cmd).splitlines()
+            if not line.startswith(("[entrypoint]", "[governor]"))] for image in (reference, candidate)]
+        if outputs[0] != outputs[1]:
+            differences.append(cmd)
+    return differences
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compare two images of the sonar-scanner.")
+    parser.add_argument("reference", help="reference image, e.g. lequal/sonar-scanner-catlab")
+    parser.add_argument("candidate", help="candidate image, e.g. lequal/sonar-scanner-catlab:slim")
+    parser.add_argument("--runs", type=int, default=5, help="number of start-up measures, default: 5")
+    parser.add_argument("--pull", action="store_true", help="pull the images from their registry")
+    parser.add_argument("--json", help="file to write the measures to")
+    args = parser.parse_args(argv)
+
+    docker_client = docker.from_env()
+    measures = [measure(docker_client, image, args.runs, args.pull) for image in (args.reference, args.candidate)]
+    differences = tool_differences(docker_client, args.reference, args.candidate)
+
+    print(f"{'':22}" + "".join(f"{m['image']:>40}" for m in measures))
+    for key in ("size_mb", "layers", "cold_get_s", "first_start_up_s", "median_start_up_s"):
+        print(f"{key:22}" + "".join(f"{m[key]:>40}" for m in measures))
+    for cmd in differences:
+        print(f"Different output for: {cmd}")
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump({"images": measures, "tool_differences": differences}, f, indent=2)
+
+    if differences or measures[1]["size_mb"] >= measures[0]["size_mb"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
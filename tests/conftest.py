@@ -0,0 +1,60 @@
+"""
+Shared configuration of the tests
+
+The tests can be distributed over several worker processes with
+pytest-xdist (``pytest -n auto``). In that case, a single SonarQube
+server is shared by all the workers: the controller starts it before
+the workers, gives them its state and stops it once every worker is done.
+"""
+
+import pytest
+
+from test_cnes_sonar_scanner import TestCNESSonarScanner
+
+SERVER_STATE = pytest.StashKey[dict]()
+
+
+def _is_xdist_worker(config) -> bool:
+    """
+    Tell whether the current process is a pytest-xdist worker
+    """
+    return hasattr(config, "workerinput")
+
+
+def pytest_sessionstart(session):
+    """
+    Start the SonarQube server of the session, in the controller
+    (the stand-in of the server is served by each worker instead)
+    """
+    if _is_xdist_worker(session.config) or TestCNESSonarScanner.SONARQUBE_STANDIN:
+        return
+    session.config.stash[SERVER_STATE] = TestCNESSonarScanner.start_server()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    Give the state of the SonarQube server to a pytest-xdist worker
+    """
+    if SERVER_STATE in node.config.stash:
+        node.workerinput["sonarqube_server"] = node.config.stash[SERVER_STATE]
+
+
+def pytest_sessionfinish(session):
+    """
+    Stop the SonarQube server once all the tests of the session are over
+    """
+    if _is_xdist_worker(session.config) or SERVER_STATE not in session.config.stash:
+        return
+    TestCNESSonarScanner.stop_server()
+    del session.config.stash[SERVER_STATE]
+
+
+@pytest.fixture(scope="session")
+def sonarqube_server_state(request):
+    """
+    State of the SonarQube server started by the controller, None with the stand-in
+    """
+    if _is_xdist_worker(request.config):
+        return request.config.workerinput.get("sonarqube_server")
+    return request.config.stash.get(SERVER_STATE, None)
@@ -0,0 +1,236 @@
+"""
+Client of the SonarQube Web API used by the tests
+
+All the calls of a test session go through one ``requests.Session`` so
+that TCP connections are kept alive and reused, the credentials are set
+once, failed calls are retried and the latency of each call is recorded.
+"""
+
+import statistics
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SonarQubeClient:
+    """
+    Pooled HTTP client of the SonarQube Web API.
+
+    GET requests are retried with an exponential backoff on connection
+    errors and on 5xx answers. POST requests are not idempotent, so they
+    are only retried when the connection could not be established.
+
+    :param url: URL of the server, without trailing /
+    :param auth: (login, password) or (token, "") to authenticate with
+    :param retries: (optional) maximum number of retries of a request, default: 5
+    :param backoff: (optional) backoff factor between retries in seconds, default: 0.5
+    :param timeout: (optional) timeout of a request in seconds, default: 30
+
+    Example (not a doctest):
+        client = SonarQubeClient("http://localhost:9000", ("admin", "adminpassword"))
+        token = client.generate_token("global_token", "GLOBAL_ANALYSIS_TOKEN", "admin")
+    """
+
+    def __init__(self, url: str, auth: Tuple[str, str], retries: int = 5,
+        backoff: float = 0.5, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+        # List of (method, endpoint, HTTP status, duration in seconds)
+        self.latencies = []
+        self.session = requests.Session()
+        self.session.auth = auth
+        retry = Retry(total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        self.session.close()
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Send a request to the server and record its latency.
+
+        :param method: HTTP method
+        :param endpoint: path of the Web service, e.g. "api/issues/search"
+        :param kwargs: forwarded to requests
+        :returns: the answer of the server
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        response = self.session.request(method, f"{self.url}/{endpoint}", **kwargs)
+        self.latencies.append((method, endpoint, response.status_code, time.perf_counter() - start))
+        return response
+
+    def get(self, endpoint: str, **params) -> dict:
+        """
+        GET a Web service and decode its JSON answer
+
+        :param endpoint: path of the Web service
+        :param params: parameters of the Web service
+        :returns: the decoded answer
+        """
+        return self.request("GET", endpoint, params=params).json()
+
+    def post(self, endpoint: str, **data) -> requests.Response:
+        """
+        POST to a Web service
+
+        :param endpoint: path of the Web service
+        :param data: parameters of the Web service
+        :returns: the answer of the server
+        """
+        return self.request("POST", endpoint, data=data)
+
+    def latency_report(self) -> str:
+        """
+        Summarize the recorded latencies, per endpoint
+
+        :returns: one line per endpoint with the number of calls, the median and the maximum latency
+        """
+        durations = {}
+        for method, endpoint, _, duration in self.latencies:
+            durations.setdefault(f"{method} {endpoint}", []).append(duration)
+        return "\n".join(
+            f"{name}: {len(values)} calls, median {statistics.median(values) * 1000:.0f}ms, max {max(values) * 1000:.0f}ms"
+            for name, values in sorted(durations.items()))
+
+    # api/system
+    def system_status(self) -> Optional[str]:
+        """
+        :returns: status of the server (e.g. UP, STARTING) or None if it cannot be reached
+        """
+        try:
+            return self.request("GET", "api/system/status", timeout=2).json().get('status')
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+    # api/user_tokens
+    def generate_token(self, name: str, token_type: str, login: str) -> str:
+        """
+        :returns: the value of the new token
+        """
+        return self.request("POST", "api/user_tokens/generate", params={
+            "name": name,
+            "type": token_type,
+            "login": login
+        }).json()['token']
+
+    def revoke_token(self, name: str):
+        """
+        Revoke a token of the authenticated user
+        """
+        self.request("POST", "api/user_tokens/revoke", params={"name": name})
+
+    # api/projects
+    def create_project(self, project_key: str, name: str) -> List[dict]:
+        """
+        :returns: the errors returned by the server, if any
+        """
+        return self.post("api/projects/create", name=name, project=project_key).json().get('errors', [])
+
+    def search_projects(self, *project_keys: str) -> List[dict]:
+        """
+        :returns: the components matching the given project keys
+        """
+        return self.get("api/projects/search", projects=",".join(project_keys))['components']
+
+    def delete_project(self, project_key: str):
+        """
+        Delete a project
+        """
+        self.post("api/projects/delete", project=project_key)
+
+    # api/qualityprofiles
+    def search_quality_profiles(self, quality_profile: str, language: str = None) -> List[dict]:
+        """
+        :returns: the Quality Profiles with the given name
+        """
+        params = {"qualityProfile": quality_profile}
+        if language:
+            params["language"] = language
+        return self.get("api/qualityprofiles/search", **params)['profiles']
+
+    def copy_quality_profile(self, from_key: str, to_name: str) -> str:
+        """
+        :returns: the key of the copy
+        """
+        return self.post("api/qualityprofiles/copy", fromKey=from_key, toName=to_name).json()['key']
+
+    def delete_quality_profile(self, language: str, quality_profile: str):
+        """
+        Delete a Quality Profile (and its descendants)
+        """
+        self.post("api/qualityprofiles/delete", language=language, qualityProfile=quality_profile)
+
+    def activate_rule(self, qp_key: str, rule: str):
+        """
+        Activate a rule in a Quality Profile
+        """
+        self.post("api/qualityprofiles/activate_rule", key=qp_key, rule=rule)
+
+    def add_project(self, language: str, project_key: str, quality_profile: str):
+        """
+        Associate a project with a Quality Profile
+        """
+        self.post("api/qualityprofiles/add_project",
+            language=language, project=project_key, qualityProfile=quality_profile)
+
+    # api/issues
+    def issue_facets(self, project_key: str, **filters) -> dict:
+        """
+        Count the issues of a project by status and by rule.
+
+        Only the facets are requested (one issue per page), so the size
+        of the answer does not depend on the number of issues.
+
+        :param project_key: project key
+        :param filters: (optional) other parameters of api/issues/search, e.g. rules="pylint:C0326"
+        :returns: dictionary {"total": number of issues, "statuses": {status: count}, "rules": {rule: count}}
+
+        Example (not a doctest):
+            facets = client.issue_facets("python-dummy-project")
+            nb_open = facets['statuses'].get('OPEN', 0)
+        """
+        output = self.get("api/issues/search", componentKeys=project_key,
+            facets="statuses,rules", ps=1, **filters)
+        facets = {
+            facet['property']: {value['val']: value['count'] for value in facet['values']}
+            for facet in output['facets']
+        }
+        return {"total": output['total'], "statuses": facets.get('statuses', {}), "rules": facets.get('rules', {})}
+
+    def iter_issues(self, project_key: str, page_size: int = 500, **filters) -> Iterator[dict]:
+        """
+        Iterate lazily over all the issues of a project, one page at a time.
+
+        Note that the server does not return more than 10,000 issues for a search.
+
+        :param project_key: project key
+        :param page_size: (optional) number of issues to fetch per request, 500 at most
+        :param filters: (optional) other parameters of api/issues/search
+        :returns: generator of issues (as returned by api/issues/search)
+        """
+        page = 1
+        while True:
+            output = self.get("api/issues/search", componentKeys=project_key, p=page, ps=page_size, **filters)
+            yield from output['issues']
+            if not output['issues'] or page * page_size >= output['paging']['total']:
+                return
+            page += 1
+
+    # api/ce
+    def ce_task(self, task_id: str) -> dict:
+        """
+        :returns: the Compute Engine task with the given id
+        """
+        return self.get("api/ce/task", id=task_id)['task']
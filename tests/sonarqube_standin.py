@@ -0,0 +1,371 @@
+"""
+Stand-in of the SonarQube Web API used by the tests
+
+It answers the Web services called by the harness (see sonarqube_client.py)
+from an HTTP server run in a thread of the test process, so that the tools
+and the harness can be tested in seconds without starting a
+lequal/sonarqube-catlab container:
+    - api/system/status
+    - api/user_tokens/generate and revoke
+    - api/projects/create, search and delete
+    - api/qualityprofiles/search, copy, delete, activate_rule and add_project
+    - api/issues/search (with the statuses and rules facets)
+    - api/ce/task
+
+Its data comes from a JSON fixture file (see sonarqube-standin.json):
+    - qualityProfiles: the Quality Profiles of the server
+    - projects: the projects that already exist
+    - issues: {"project key pattern": [issues]}, the issues of the projects
+      whose key matches the (fnmatch) pattern, e.g. "python-dummy-project*"
+      so that the keys suffixed with the id of a pytest-xdist worker match
+    - ceTasks: Compute Engine tasks whose "statuses" are returned one after
+      the other, one per call of api/ce/task, the last one is kept
+
+It does not analyse anything: the scenarios that run the sonar-scanner
+against the server need the real one.
+"""
+
+import base64
+import copy
+import fnmatch
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class StandinError(Exception):
+    """
+    Error of a Web service, answered as {"errors": [{"msg": ...}]}
+
+    :param status: HTTP status of the answer
+    :param message: message of the error
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SonarQubeStandin:
+    """
+    In-process stand-in of a SonarQube server.
+
+    :param fixtures: data of the server (see the module documentation)
+    :param admin_password: password of the admin account
+    :param host: (optional) address to listen to, default: 127.0.0.1
+    :param port: (optional) port to listen to, default: a free port
+
+    Example (not a doctest):
+        with SonarQubeStandin.from_file("sonarqube-standin.json", "adminpassword") as standin:
+            client = SonarQubeClient(standin.url, ("admin", "adminpassword"))
+    """
+
+    def __init__(self, fixtures: dict, admin_password: str, host: str = "127.0.0.1", port: int = 0):
+        self.admin_password = admin_password
+        self.lock = threading.Lock()
+        self.quality_profiles = copy.deepcopy(fixtures.get("qualityProfiles", []))
+        self.projects = {project["key"]: dict(project) for project in fixtures.get("projects", [])}
+        self.issues = copy.deepcopy(fixtures.get("issues", {}))
+        self.ce_tasks = {task["id"]: {**task, "calls": 0} for task in copy.deepcopy(fixtures.get("ceTasks", []))}
+        # {token value: {"name", "login", "type"}}
+        self.tokens = {}
+        # {(project key, language): Quality Profile key}
+        self.project_profiles = {}
+        # {Quality Profile key: set of rules}
+        self.active_rules = {}
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.thread = None
+
+    @classmethod
+    def from_file(cls, path: str, admin_password: str, **kwargs) -> "SonarQubeStandin":
+        """
+        :param path: JSON fixture file
+        :returns: a stand-in serving the data of the file
+        """
+        with open(path, "r", encoding="utf8") as f:
+            return cls(json.load(f), admin_password, **kwargs)
+
+    @property
+    def url(self) -> str:
+        """
+        :returns: URL of the stand-in, without trailing /
+        """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Serve the Web API in a background thread
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop serving and close the socket
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # HTTP
+    def handler(self):
+        """
+        :returns: the request handler class bound to this stand-in
+        """
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Dispatch the requests to the Web services of the stand-in
+            """
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                self.dispatch("GET")
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                self.dispatch("POST")
+
+            def dispatch(self, method: str):
+                """
+                Call the Web service of the path with the parameters of the query and of the form
+                """
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update(parse_qsl(self.rfile.read(length).decode("utf-8")))
+                try:
+                    if not standin.authenticated(self.headers.get("Authorization", "")):
+                        raise StandinError(401, "Authentication required")
+                    service = standin.services().get((method, url.path.strip("/")))
+                    if service is None:
+                        raise StandinError(404, f"Unknown url: {url.path}")
+                    status, body = 200, service(params)
+                except StandinError as error:
+                    status, body = error.status, {"errors": [{"msg": str(error)}]}
+                if body is None:
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                # Keep the output of the tests readable
+                pass
+
+        return Handler
+
+    def authenticated(self, authorization: str) -> bool:
+        """
+        :param authorization: Authorization header of a request
+        :returns: True for the admin account or a token generated by the stand-in
+        """
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme == "Bearer":
+            return credentials in self.tokens
+        if scheme != "Basic":
+            return False
+        login, _, password = base64.b64decode(credentials).decode("utf-8").partition(":")
+        return (login, password) == ("admin", self.admin_password) or (login in self.tokens and not password)
+
+    def services(self) -> dict:
+        """
+        :returns: dictionary {(HTTP method, path): Web service}
+        """
+        return {
+            ("GET", "api/system/status"): lambda params: {"status": "UP"},
+            ("POST", "api/user_tokens/generate"): self.generate_token,
+            ("POST", "api/user_tokens/revoke"): self.revoke_token,
+            ("POST", "api/projects/create"): self.create_project,
+            ("GET", "api/projects/search"): self.search_projects,
+            ("POST", "api/projects/delete"): self.delete_project,
+            ("GET", "api/qualityprofiles/search"): self.search_quality_profiles,
+            ("POST", "api/qualityprofiles/copy"): self.copy_quality_profile,
+            ("POST", "api/qualityprofiles/delete"): self.delete_quality_profile,
+            ("POST", "api/qualityprofiles/activate_rule"): self.activate_rule,
+            ("POST", "api/qualityprofiles/add_project"): self.add_project,
+            ("GET", "api/issues/search"): self.search_issues,
+            ("GET", "api/ce/task"): self.ce_task,
+        }
+
+    # api/user_tokens
+    def generate_token(self, params: dict) -> dict:
+        """
+        api/user_tokens/generate
+        """
+        with self.lock:
+            if any(token["name"] == params["name"] for token in self.tokens.values()):
+                raise StandinError(400, f"A user token for login 'admin' and name '{params['name']}' already exists")
+            value = f"squ_{uuid.uuid4().hex}"
+            self.tokens[value] = {"name": params["name"], "login": params.get("login", "admin"),
+                "type": params.get("type", "USER_TOKEN")}
+        return {**self.tokens[value], "token": value, "createdAt": now()}
+
+    def revoke_token(self, params: dict):
+        """
+        api/user_tokens/revoke
+        """
+        with self.lock:
+            self.tokens = {value: token for value, token in self.tokens.items() if token["name"] != params["name"]}
+
+    # api/projects
+    def create_project(self, params: dict) -> dict:
+        """
+        api/projects/create
+        """
+        with self.lock:
+            if params["project"] in self.projects:
+                raise StandinError(400, f"Could not create Project with key: \"{params['project']}\". "
+                    "A similar key already exists")
+            self.projects[params["project"]] = {"key": params["project"], "name": params["name"],
+                "qualifier": "TRK", "visibility": "public"}
+        return {"project": self.projects[params["project"]]}
+
+    def search_projects(self, params: dict) -> dict:
+        """
+        api/projects/search
+        """
+        keys = params.get("projects", "").split(",") if params.get("projects") else None
+        with self.lock:
+            components = [project for key, project in self.projects.items() if keys is None or key in keys]
+        return {"paging": {"pageIndex": 1, "pageSize": 100, "total": len(components)}, "components": components}
+
+    def delete_project(self, params: dict):
+        """
+        api/projects/delete
+        """
+        with self.lock:
+            if self.projects.pop(params["project"], None) is None:
+                raise StandinError(404, f"Project '{params['project']}' not found")
+
+    # api/qualityprofiles
+    def find_quality_profile(self, name: str, language: str) -> dict:
+        """
+        :returns: the Quality Profile with the given name and language
+        """
+        profile = next((profile for profile in self.quality_profiles
+            if profile["name"] == name and profile["language"] == language), None)
+        if profile is None:
+            raise StandinError(404, f"Quality Profile for language '{language}' and name '{name}' does not exist")
+        return profile
+
+    def search_quality_profiles(self, params: dict) -> dict:
+        """
+        api/qualityprofiles/search
+        """
+        with self.lock:
+            profiles = [profile for profile in self.quality_profiles
+                if params.get("qualityProfile") in (None, profile["name"])
+                and params.get("language") in (None, profile["language"])]
+        return {"profiles": profiles}
+
+    def copy_quality_profile(self, params: dict) -> dict:
+        """
+        api/qualityprofiles/copy
+        """
+        with self.lock:
+            source = next((profile for profile in self.quality_profiles if profile["key"] == params["fromKey"]), None)
+            if source is None:
+                raise StandinError(404, f"Quality Profile with key '{params['fromKey']}' does not exist")
+            profile = {**source, "key": f"AX{uuid.uuid4().hex[:18]}", "name": params["toName"], "isBuiltIn": False}
+            self.quality_profiles.append(profile)
+            self.active_rules[profile["key"]] = set(self.active_rules.get(source["key"], ()))
+        return profile
+
+    def delete_quality_profile(self, params: dict):
+        """
+        api/qualityprofiles/delete
+        """
+        with self.lock:
+            profile = self.find_quality_profile(params["qualityProfile"], params["language"])
+            if profile.get("isBuiltIn"):
+                raise StandinError(400, "Operation forbidden for built-in Quality Profile")
+            self.quality_profiles.remove(profile)
+            self.active_rules.pop(profile["key"], None)
+
+    def activate_rule(self, params: dict):
+        """
+        api/qualityprofiles/activate_rule
+        """
+        with self.lock:
+            if not any(profile["key"] == params["key"] for profile in self.quality_profiles):
+                raise StandinError(404, f"Quality Profile with key '{params['key']}' does not exist")
+            self.active_rules.setdefault(params["key"], set()).add(params["rule"])
+
+    def add_project(self, params: dict):
+        """
+        api/qualityprofiles/add_project
+        """
+        with self.lock:
+            if params["project"] not in self.projects:
+                raise StandinError(404, f"Project '{params['project']}' not found")
+            profile = self.find_quality_profile(params["qualityProfile"], params["language"])
+            self.project_profiles[(params["project"], params["language"])] = profile["key"]
+
+    # api/issues
+    def search_issues(self, params: dict) -> dict:
+        """
+        api/issues/search, filtered by rules and statuses, with the statuses and rules facets
+        """
+        project_key = params.get("componentKeys", "")
+        issues = [issue for pattern, project_issues in self.issues.items()
+            if fnmatch.fnmatchcase(project_key, pattern) for issue in project_issues]
+        for name, field in (("rules", "rule"), ("statuses", "status")):
+            if params.get(name):
+                issues = [issue for issue in issues if issue[field] in params[name].split(",")]
+        page, page_size = int(params.get("p", 1)), int(params.get("ps", 100))
+        facets = []
+        for name, field in (("statuses", "status"), ("rules", "rule")):
+            if name in params.get("facets", "").split(","):
+                counts = {}
+                for issue in issues:
+                    counts[issue[field]] = counts.get(issue[field], 0) + 1
+                facets.append({"property": name, "values": [{"val": value, "count": count}
+                    for value, count in sorted(counts.items(), key=lambda item: -item[1])]})
+        return {
+            "total": len(issues),
+            "p": page,
+            "ps": page_size,
+            "paging": {"pageIndex": page, "pageSize": page_size, "total": len(issues)},
+            "issues": [{**issue, "project": project_key, "component": f"{project_key}:{issue.get('file', '')}"}
+                for issue in issues[(page - 1) * page_size:page * page_size]],
+            "facets": facets,
+        }
+
+    # api/ce
+    def ce_task(self, params: dict) -> dict:
+        """
+        api/ce/task, each call moves the task to its next status
+        """
+        with self.lock:
+            task = self.ce_tasks.get(params["id"])
+            if task is None:
+                raise StandinError(404, f"No activity found for task '{params['id']}'")
+            statuses = task["statuses"]
+            status = statuses[min(task["calls"], len(statuses) - 1)]
+            task["calls"] += 1
+        fields = {key: value for key, value in task.items() if key not in ("statuses", "calls")}
+        return {"task": {**fields, "status": status}}
+
+
+def now() -> str:
+    """
+    :returns: the current time as written by SonarQube, e.g. 2024-05-02T08:15:42+0000
+    """
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S%z")
@@ -7,12 +7,20 @@ Pytest documentation: https://docs.pytest.org/en/stable/contents.html
 """
 
 import filecmp
+import json
 import os
+import re
+import threading
 import time
 from pathlib import Path
 
 import docker
-import requests
+import pytest
+
+import benchmark
+from sonarqube_client import SonarQubeClient
+from sonarqube_standin import SonarQubeStandin
+from tool_runner import ToolRunner
 
 
 class TestCNESSonarScanner:
@@ -23,11 +31,24 @@ class TestCNESSonarScanner:
     It does not build any image.
     Tests can be parametered with environment variables.
 
+    Tests can be distributed over several processes with pytest-xdist
+    (``pytest -n auto``). All the workers share the same server and token
+    but each worker analyses its own projects (project keys are suffixed
+    with the worker id) so that they do not interfere with each other.
+
+    The commands of the tests (analyses and tools) are executed in a single
+    container of the image per worker (see tool_runner.py), except for the
+    benchmark which times the start of a container.
+
     Environment variables:
         RUN: whether or not to run a lequal/sonarqube-catlab container and create a
              bridge network, default "yes", if you already have a running
              container, set it to "no" and provide information through the
              other variables.
+        SONARQUBE_STANDIN: whether or not to replace the server with an in-process
+                           stand-in of its Web API served from the data of
+                           sonarqube-standin.json, default "no". The scenarios
+                           that analyse projects on the server are skipped.
         SONARQUBE_CONTAINER_NAME: the name to give to the container running
                                   the lequal/sonarqube-catlab image.
         SONARQUBE_ADMIN_PASSWORD: the password of the admin account on the server.
@@ -41,27 +62,146 @@ class TestCNESSonarScanner:
         SONARQUBE_TAG: the tag of the lequal/sonarqube-catlab image to use.
                         e.g. latest
         SONARQUBE_NETWORK: the name of the docker bridge used.
+        SONARQUBE_CE_TIMEOUT: maximum number of seconds to wait for the server
+                              to process an analysis report, default 300.
+        SONARQUBE_READY_TIMEOUT: maximum number of seconds to wait for the server
+                                 to be configured, default 900.
+        SONAR_SCANNER_IMAGE: the image to test, default lequal/sonar-scanner-catlab.
+        BENCHMARK: whether or not to run the benchmark, default "no".
+        BENCHMARK_RUNS: number of runs of each scenario of the benchmark, default 5.
+        BENCHMARK_OUTPUT: file to write the results of the benchmark to
+                          (path from the tests/ folder), default benchmark-results.json.
+        BENCHMARK_BASELINE: results to compare the benchmark with
+                            (path from the tests/ folder), default benchmark-baseline.json.
+        BENCHMARK_THRESHOLD: relative slowdown of a median that is a regression, default 0.2.
+        BENCHMARK_MIN_DELTA_MS: minimum slowdown of a median in milliseconds
+                                that is a regression, default 200.
+        BENCHMARK_UPDATE_BASELINE: whether or not to replace the baseline
+                                   with the results, default "no".
     """
     # Class variables
     RUN = os.environ.get('RUN', "yes") == "yes"
+    SONARQUBE_STANDIN = os.environ.get("SONARQUBE_STANDIN", "no") == "yes"
     SONARQUBE_CONTAINER_NAME = os.environ.get("SONARQUBE_CONTAINER_NAME", "lequalsonarqube")
     SONARQUBE_ADMIN_PASSWORD = os.environ.get("SONARQUBE_ADMIN_PASSWORD", "adminpassword")
     SONARQUBE_URL = os.environ.get("SONARQUBE_URL", f"http://{SONARQUBE_CONTAINER_NAME}:9000")
     SONARQUBE_LOCAL_URL = os.environ.get("SONARQUBE_LOCAL_URL", "http://localhost:9000")
     SONARQUBE_TAG = os.environ.get("SONARQUBE_TAG", "latest")
     SONARQUBE_NETWORK = os.environ.get("SONARQUBE_NETWORK", "sonarbridge")
-    _SONAR_SCANNER_IMAGE = "lequal/sonar-scanner-catlab"
+    SONARQUBE_CE_TIMEOUT = float(os.environ.get("SONARQUBE_CE_TIMEOUT", "300"))
+    SONARQUBE_READY_TIMEOUT = float(os.environ.get("SONARQUBE_READY_TIMEOUT", "900"))
+    _READY_MARKER = b'[INFO] CNES SonarQube: ready!'
+    _SONAR_SCANNER_IMAGE = os.environ.get("SONAR_SCANNER_IMAGE", "lequal/sonar-scanner-catlab")
     _PROJECT_ROOT_DIR = str(Path(os.getcwd()).parent)
+    _STANDIN_FIXTURES = "sonarqube-standin.json"
+    # Scenarios that run the sonar-scanner against the server
+    _REQUIRES_SERVER = pytest.mark.skipif(SONARQUBE_STANDIN,
+        reason="the stand-in of the server (SONARQUBE_STANDIN=yes) does not process analyses")
+    BENCHMARK = os.environ.get("BENCHMARK", "no") == "yes"
+    BENCHMARK_RUNS = int(os.environ.get("BENCHMARK_RUNS", "5"))
+    BENCHMARK_OUTPUT = os.environ.get("BENCHMARK_OUTPUT", "benchmark-results.json")
+    BENCHMARK_BASELINE = os.environ.get("BENCHMARK_BASELINE", "benchmark-baseline.json")
+    BENCHMARK_THRESHOLD = float(os.environ.get("BENCHMARK_THRESHOLD", "0.2"))
+    BENCHMARK_MIN_DELTA_MS = float(os.environ.get("BENCHMARK_MIN_DELTA_MS", "200"))
+    BENCHMARK_UPDATE_BASELINE = os.environ.get("BENCHMARK_UPDATE_BASELINE", "no") == "yes"
+    # Language fixtures (folders of tests/) and tool commands run by the benchmark
+    _BENCHMARK_LANGUAGES = ("c_cpp", "fortran77", "fortran90", "java", "python", "shell")
+    _BENCHMARK_TOOLS = {
+        "cppcheck": "cppcheck --xml-version=2 tests/c_cpp/cppcheck/main.c --output-file=/tmp/cppcheck-report.xml",
+        "pylint": "pylint --exit-zero -f json --rcfile=/opt/python/pylintrc_RNC2015_A_B tests/python/src/simplecaesar.py",
+        "shellcheck": "bash -c 'shellcheck -s sh -f checkstyle tests/shell/src/script.sh || true'",
+        "hadolint": "hadolint -f sonarqube --no-fail tests/docker/src/Dockerfile",
+    }
     SONARQUBE_TOKEN = ""
+    WORKER_ID = "master"
+    # Clients shared by all the tests of a worker
+    API = SonarQubeClient(SONARQUBE_LOCAL_URL, ("admin", SONARQUBE_ADMIN_PASSWORD))
+    _DOCKER_CLIENT = None
+    _TOOL_RUNNER = None
 
     # Setup and Teardown
+    @pytest.fixture(scope="class", autouse=True)
     @classmethod
-    def setup_class(cls):
+    def sonarqube_server(cls, sonarqube_server_state, worker_id):
         """
         Set up the tests
+        Retrieve the token of the server of the session, started
+        and stopped by the controller of the workers (see conftest.py).
+        With SONARQUBE_STANDIN, each worker serves its own stand-in instead.
+        """
+        cls.WORKER_ID = worker_id
+        if cls.SONARQUBE_STANDIN:
+            with SonarQubeStandin.from_file(cls._STANDIN_FIXTURES, cls.SONARQUBE_ADMIN_PASSWORD) as standin:
+                cls.API = SonarQubeClient(standin.url, ("admin", cls.SONARQUBE_ADMIN_PASSWORD))
+                cls.get_sonarqube_token()
+                yield
+                cls.stop_tool_runner()
+                cls.API.close()
+            return
+        cls.SONARQUBE_TOKEN = sonarqube_server_state["token"]
+        yield
+        cls.stop_tool_runner()
+        print(f"Latency of the SonarQube Web API calls:\n{cls.API.latency_report()}")
+
+    @classmethod
+    def get_docker_client(cls) -> docker.DockerClient:
+        """
+        :returns: the Docker client shared by all the tests of the worker
+        """
+        if cls._DOCKER_CLIENT is None:
+            cls._DOCKER_CLIENT = docker.from_env()
+        return cls._DOCKER_CLIENT
+
+    @classmethod
+    def get_tool_runner(cls) -> ToolRunner:
+        """
+        :returns: the container of the image shared by all the tests of the worker,
+                  started at its first use
+        """
+        if cls._TOOL_RUNNER is None:
+            cls._TOOL_RUNNER = ToolRunner(cls.get_docker_client(), cls._SONAR_SCANNER_IMAGE,
+                volumes={
+                    f"{cls._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'rw'},
+                    f"{cls._PROJECT_ROOT_DIR}/.sonarcache": {'bind': '/opt/sonar-scanner/.sonar/cache', 'mode': 'rw'}
+                },
+                network=None if cls.SONARQUBE_STANDIN else cls.SONARQUBE_NETWORK)
+            cls._TOOL_RUNNER.start()
+        return cls._TOOL_RUNNER
+
+    @classmethod
+    def stop_tool_runner(cls):
+        """
+        Remove the container of the image of the worker, if it was started
+        """
+        if cls._TOOL_RUNNER is not None:
+            print(f"Commands run in the container of the image: {cls._TOOL_RUNNER.duration_report()}")
+            cls._TOOL_RUNNER.stop()
+            cls._TOOL_RUNNER = None
+
+    @classmethod
+    def run_command(cls, cmd: str, stderr: bool = False, **kwargs) -> str:
+        """
+        Run a command in the container of the image of the worker
+        and check that it succeeded.
+
+        :param cmd: command, as given to a container of the image
+        :param stderr: (optional) append the standard error to the output, default: False
+        :param kwargs: environment and/or workdir of the command
+        :returns: the output of the command
+        """
+        result = cls.get_tool_runner().run(cmd, **kwargs)
+        # Hint: if this test fails, look at the output of the command
+        assert result.exit_code == 0, f"{cmd} exited with {result.exit_code}:\n{result.output}{result.errors}"
+        return result.output + result.errors if stderr else result.output
+
+    @classmethod
+    def start_server(cls) -> dict:
+        """
         Launch a lequal/sonarqube-catlab container and wait for it to be up
+
+        :returns: state of the server to share with the other workers
         """
-        docker_client = docker.from_env()
+        docker_client = cls.get_docker_client()
         # Launch a CNES SonarQube container
         if cls.RUN:
             print(f"Creating bridge network (name={cls.SONARQUBE_NETWORK})...")
@@ -86,21 +226,18 @@ class TestCNESSonarScanner:
         cls.wait_cnes_sonarqube_ready(cls.SONARQUBE_CONTAINER_NAME)
         # Retrieve the token
         cls.get_sonarqube_token()
+        return {"token": cls.SONARQUBE_TOKEN}
 
     @classmethod
-    def teardown_class(cls):
+    def stop_server(cls):
         """
         Stop the container
         """
         # Revoke the token
-        requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/user_tokens/revoke",
-                      auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                    params={
-                        "name": "global_token"
-                    })
+        cls.API.revoke_token("global_token")
         if cls.RUN:
             print(f"Stopping {cls.SONARQUBE_CONTAINER_NAME}...")
-            docker_client = docker.from_env()
+            docker_client = cls.get_docker_client()
             docker_client.containers.get(cls.SONARQUBE_CONTAINER_NAME).stop()
             print(f"Removing bridge network {cls.SONARQUBE_NETWORK}...")
             docker_client.networks.get(cls.SONARQUBE_NETWORK).remove()
@@ -111,27 +248,167 @@ class TestCNESSonarScanner:
         """
         Retrieve SonarQube token with global analysis from the server
         """
-        sonarqube_token = requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/user_tokens/generate",
-                                            auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                                            params={
-                                                "name": "global_token",
-                                                "type": "GLOBAL_ANALYSIS_TOKEN",
-                                                "login": "admin"
-                                            })
-        cls.SONARQUBE_TOKEN = sonarqube_token.json()["token"]
+        cls.SONARQUBE_TOKEN = cls.API.generate_token("global_token", "GLOBAL_ANALYSIS_TOKEN", "admin")
 
     @classmethod
-    def wait_cnes_sonarqube_ready(cls, container_name: str, tail = "all"):
+    def is_sonarqube_up(cls) -> bool:
+        """
+        Probe the status of the SonarQube server.
+
+        :returns: True if the server answers that it is UP
+        """
+        return cls.API.system_status() == 'UP'
+
+    @classmethod
+    def wait_cnes_sonarqube_ready(cls, container_name: str, timeout: float = None):
         """
         This function waits for SonarQube to be configured by
         the configure.bash script.
 
+        A server that was already running (RUN=no) is considered ready as
+        soon as its API answers UP. Otherwise, the logs of the container
+        are followed as a stream and only the new bytes are searched
+        for the ready marker.
+
         :param container_name: name of the container running lequal/sonarqube-catlab
-        :param tail: forwarded to docker logs
+        :param timeout: (optional) maximum number of seconds to wait, default: SONARQUBE_READY_TIMEOUT
+        """
+        if timeout is None:
+            timeout = cls.SONARQUBE_READY_TIMEOUT
+        if not cls.RUN and cls.is_sonarqube_up():
+            return
+        docker_client = cls.get_docker_client()
+        logs = docker_client.containers.get(container_name).logs(stream=True, follow=True)
+        ready = threading.Event()
+
+        def watch_logs():
+            """
+            Scan the log stream until the ready marker is found
+            """
+            # Keep the end of the previous chunk in case the marker is split
+            overlap = len(cls._READY_MARKER) - 1
+            previous = b""
+            for chunk in logs:
+                data = previous + chunk
+                if cls._READY_MARKER in data:
+                    ready.set()
+                    return
+                previous = data[-overlap:]
+
+        watcher = threading.Thread(target=watch_logs, daemon=True)
+        watcher.start()
+        try:
+            # The watcher stops early if the container exits
+            watcher.join(timeout)
+        finally:
+            logs.close()
+        # Hint: if this test fails, look at the logs of the server container
+        assert ready.is_set(), f"{container_name} was not ready after {timeout} seconds"
+
+    @classmethod
+    def worker_project_key(cls, project_key: str) -> str:
+        """
+        Make a project key unique to the current pytest-xdist worker
+
+        :param project_key: project key of the scenario
+        :returns: the project key to use on the server
+        """
+        if cls.WORKER_ID == "master":
+            return project_key
+        return f"{project_key}-{cls.WORKER_ID}"
+
+    @staticmethod
+    def scanner_work_dir(project_key: str) -> str:
+        """
+        Working directory of the sonar-scanner for a project, relative to its base directory.
+        Each project gets its own one so that analyses of the same folder can run concurrently.
+
+        :param project_key: project key used on the server
+        :returns: value for sonar.working.directory
+        """
+        return f".scannerwork/{project_key}"
+
+    @classmethod
+    def get_ce_task_id(cls, base_dir: str, project_key: str, scanner_output: str) -> str:
+        """
+        Retrieve the id of the Compute Engine task created by an analysis.
+
+        The id is read from the report-task.txt file written by the scanner
+        and, if it cannot be found there, from the scanner output.
+
+        :param base_dir: project base directory of the analysis (path from the root of the project)
+        :param project_key: project key used on the server
+        :param scanner_output: output of the sonar-scanner
+        :returns: id of the Compute Engine task
         """
-        docker_client = docker.from_env()
-        while b'[INFO] CNES SonarQube: ready!' not in docker_client.containers.get(container_name).logs(tail=tail):
-            time.sleep(10)
+        report_task = os.path.join(cls._PROJECT_ROOT_DIR, base_dir, cls.scanner_work_dir(project_key), "report-task.txt")
+        if os.path.exists(report_task):
+            with open(report_task, "r", encoding="utf8") as f:
+                for line in f:
+                    if line.startswith("ceTaskId="):
+                        return line.strip().split("=", 1)[1]
+        match = re.search(r"api/ce/task\?id=([\w-]+)", scanner_output)
+        # Hint: if this test fails, the scanner did not upload any analysis report
+        assert match
+        return match.group(1)
+
+    @classmethod
+    def wait_ce_task(cls, task_id: str):
+        """
+        This function waits for SonarQube to process an analysis report.
+
+        The Compute Engine task is polled with an exponential backoff
+        until it is over or until SONARQUBE_CE_TIMEOUT seconds have passed.
+
+        :param task_id: id of the Compute Engine task
+        :returns: final status of the task (SUCCESS, FAILED or CANCELED)
+        """
+        deadline = time.monotonic() + cls.SONARQUBE_CE_TIMEOUT
+        delay = 0.25
+        while True:
+            task = cls.API.ce_task(task_id)
+            if task['status'] in ('SUCCESS', 'FAILED', 'CANCELED'):
+                return task['status']
+            # Hint: if this test fails, the server is too slow, increase SONARQUBE_CE_TIMEOUT
+            assert time.monotonic() + delay < deadline, f"Compute Engine task {task_id} is still {task['status']}"
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+    @classmethod
+    def wait_analysis_processed(cls, base_dir: str, project_key: str, scanner_output: str):
+        """
+        Wait for SonarQube to process the report uploaded by an analysis
+        and check that it succeeded.
+
+        :param base_dir: project base directory of the analysis (path from the root of the project)
+        :param project_key: project key used on the server
+        :param scanner_output: output of the sonar-scanner
+        """
+        status = cls.wait_ce_task(cls.get_ce_task_id(base_dir, project_key, scanner_output))
+        # Hint: if this test fails, look for the error in the background tasks of the server
+        assert status == 'SUCCESS'
+
+    @classmethod
+    def run_timed(cls, cmd: str, **kwargs):
+        """
+        Run a container of the image and time the phases of its run.
+
+        :param cmd: command of the container
+        :param kwargs: other arguments of the container (environment, volumes...)
+        :returns: (output of the container, timings of the container and of the sonar-scanner)
+        """
+        requested_at = time.time()
+        container = cls.get_docker_client().containers.run(cls._SONAR_SCANNER_IMAGE, cmd, detach=True, **kwargs)
+        try:
+            container.wait()
+            container.reload()
+            output = container.logs().decode("utf-8")
+            timings = benchmark.container_timings(requested_at, container.attrs["State"],
+                container.logs(timestamps=True).decode("utf-8"))
+        finally:
+            container.remove(force=True)
+        timings.update(benchmark.scanner_timings(output))
+        return output, timings
 
     @classmethod
     def language(cls, language_name: str, language_key: str, folder: str,
@@ -164,7 +441,7 @@ class TestCNESSonarScanner:
             )
             self.language("Java", "java", "java", sensors, "java-dummy-project", 3, "CNES_JAVA_A", 6)
         """
-        docker_client = docker.from_env()
+        project_key = cls.worker_project_key(project_key)
 
         # Inner functions to factor out some code
         def analyse_project():
@@ -175,17 +452,10 @@ class TestCNESSonarScanner:
             """
 
             print(f"Analysing project {project_key}...")
-            output = docker_client.containers.run(cls._SONAR_SCANNER_IMAGE,
-                f"-Dsonar.projectBaseDir=/usr/src/tests/{folder} -Dsonar.login={cls.SONARQUBE_TOKEN}",
-                auto_remove=True,
-                environment={"SONAR_HOST_URL": cls.SONARQUBE_URL},
-                network=cls.SONARQUBE_NETWORK,
-                user="0:0",
-                volumes={
-                    f"{cls._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'rw'},
-                    f"{cls._PROJECT_ROOT_DIR}/.sonarcache": {'bind': '/opt/sonar-scanner/.sonar/cache', 'mode': 'rw'}
-                }).decode("utf-8")
-            return output
+            return cls.run_command(
+                f"-Dsonar.projectBaseDir=/usr/src/tests/{folder} -Dsonar.projectKey={project_key} \
+                -Dsonar.working.directory={cls.scanner_work_dir(project_key)} -Dsonar.login={cls.SONARQUBE_TOKEN}",
+                environment={"SONAR_HOST_URL": cls.SONARQUBE_URL})
 
         def get_number_of_issues():
             """
@@ -193,10 +463,8 @@ class TestCNESSonarScanner:
 
             :returns: the number of issues
             """
-            output = requests.get(f"{cls.SONARQUBE_LOCAL_URL}/api/issues/search?componentKeys={project_key}",
-                        auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD)).json()['issues']
-            issues = [ issue for issue in output if issue['status'] in ('OPEN', 'TO_REVIEW') ]
-            return len(issues)
+            statuses = cls.API.issue_facets(project_key)['statuses']
+            return sum(statuses.get(status, 0) for status in ('OPEN', 'TO_REVIEW'))
 
         # Analyse the project
         output = analyse_project()
@@ -205,12 +473,11 @@ class TestCNESSonarScanner:
             # Hint: if this test fails, a plugin may not be installed correctly or a sensor is not triggered when needed
             assert any(sensor_line in line for line in output.split('\n'))
         # Wait for SonarQube to process the results
-        time.sleep(8)
+        cls.wait_analysis_processed(f"tests/{folder}", project_key, output)
         # Check that the project was added to the server
-        output = requests.get(f"{cls.SONARQUBE_LOCAL_URL}/api/projects/search?projects={project_key}",
-                        auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD)).json()
+        components = cls.API.search_projects(project_key)
         # Hint: if this test fails, the project is not on the server
-        assert output['components'][0]['key'] == project_key
+        assert components[0]['key'] == project_key
         # Hint: if this test fails, there should be {nb_issues issues} on the {language_name}
         # dummy project with the Sonar way QP but {len(issues)} were found
         assert get_number_of_issues() == nb_issues
@@ -218,25 +485,13 @@ class TestCNESSonarScanner:
         # If the language has a specific CNES Quality Profile, it must also be tested
         if cnes_qp:
             # Switch to CNES QP
-            requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/add_project",
-                auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                data={
-                    "language": language_key,
-                    "project": project_key,
-                    "qualityProfile": cnes_qp
-                })
+            cls.API.add_project(language_key, project_key, cnes_qp)
             # Rerun the analysis
-            analyse_project()
+            output = analyse_project()
             # Wait for SonarQube to process the results
-            time.sleep(8)
+            cls.wait_analysis_processed(f"tests/{folder}", project_key, output)
             # Switch back to the Sonar way QP (in case the test needs to be rerun)
-            requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/add_project",
-                auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                data={
-                    "language": language_key,
-                    "project": project_key,
-                    "qualityProfile": "Sonar way"
-                })
+            cls.API.add_project(language_key, project_key, "Sonar way")
             # Hint: if this test fails, there should be {nb_issues_cnes_qp} issues on the {language_name} dummy project with the {cnes_qp} QP but {len(issues)} were found
             assert get_number_of_issues() == nb_issues_cnes_qp
 
@@ -259,11 +514,7 @@ class TestCNESSonarScanner:
             self.analysis_tool("cppcheck", cmd, ref, output, False)
         """
         # Run an analysis with the tool
-        docker_client = docker.from_env()
-        output = docker_client.containers.run(cls._SONAR_SCANNER_IMAGE, cmd,
-            auto_remove=True,
-            user="0:0",
-            volumes={f"{cls._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'rw'}}).decode("utf-8")
+        output = cls.run_command(cmd)
         if store_output:
             with open(os.path.join(cls._PROJECT_ROOT_DIR, tmp_file), "w", encoding="utf8") as f:
                 f.write(output)
@@ -299,72 +550,44 @@ class TestCNESSonarScanner:
             self.import_analysis_results("CppCheck Dummy Project", "cppcheck-dummy-project",
                 "CNES_C_A", "c++", "tests/c_cpp", "cppcheck", rule_violated, expected_sensor, expected_import)
         """
+        project_key = cls.worker_project_key(project_key)
         if activate_rule:
             # Get the key of the Quality Profile to use
-            qp_key = requests.get(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/search?quality_profile={quality_profile}",
-                auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD)).json()['profiles'][0]['key']
+            qp_key = cls.API.search_quality_profiles(quality_profile, language_key)[0]['key']
+            # Work on a copy of the Quality Profile so that the other projects
+            # (possibly analysed concurrently) are not affected by the rule
+            quality_profile = f"{quality_profile} ({project_key})"
+            qp_key = cls.API.copy_quality_profile(qp_key, quality_profile)
             # Activate the rule in the Quality Profile to allow the Sensor to be used
-            requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/activate_rule",
-                auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                data={
-                    "key": qp_key,
-                    "rule": rule_violated
-                })
+            cls.API.activate_rule(qp_key, rule_violated)
         # Create a project on SonarQube
-        errors = requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/projects/create",
-            auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-            data={
-                "name": project_name,
-                "project": project_key
-            }).json().get('errors', [])
+        errors = cls.API.create_project(project_key, project_name)
         assert not errors
         # Set its Quality Profile for the given language to the given one
-        requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/add_project",
-            auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-            data={
-                "language": language_key,
-                "project": project_key,
-                "qualityProfile": quality_profile
-            })
+        cls.API.add_project(language_key, project_key, quality_profile)
         # Analyse the project and collect the analysis files (that match the default names)
-        docker_client = docker.from_env()
-        analysis_output = docker_client.containers.run(cls._SONAR_SCANNER_IMAGE,
+        analysis_output = cls.run_command(
             f"-Dsonar.projectKey={project_key} -Dsonar.projectName=\"{project_name}\" -Dsonar.projectVersion=1.0 -Dsonar.sources={source_folder} \
-            -Dsonar.login={cls.SONARQUBE_TOKEN}",
-            auto_remove=True,
-            user="0:0",
-            volumes={
-                f"{cls._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'rw'},
-                f"{cls._PROJECT_ROOT_DIR}/.sonarcache": {'bind': '/opt/sonar-scanner/.sonar/cache', 'mode': 'rw'}
-            },
+            -Dsonar.working.directory={cls.scanner_work_dir(project_key)} -Dsonar.login={cls.SONARQUBE_TOKEN}",
             environment={"SONAR_HOST_URL": cls.SONARQUBE_URL},
-            network=cls.SONARQUBE_NETWORK,
-            working_dir=f"/usr/src/{language_folder}").decode("utf-8")
+            workdir=f"/usr/src/{language_folder}")
         for line in (expected_sensor, expected_import):
             # Hint: if this test fails, the sensor for the tool or for the importation was not launched
             assert line in analysis_output
         # Wait for SonarQube to process the results
-        time.sleep(10)
+        cls.wait_analysis_processed(language_folder, project_key, analysis_output)
         # Check that the issue was added to the project
-        issues = requests.get(f"{cls.SONARQUBE_LOCAL_URL}/api/issues/search?componentKeys={project_key}",
-            auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD)).json()['issues']
-        nb_issues = len([ issue for issue in issues if issue['rule'] == rule_violated ])
+        nb_issues = cls.API.issue_facets(project_key, rules=rule_violated)['rules'].get(rule_violated, 0)
         # Hint: an issue must be raised by the rule violated
         assert nb_issues == 1
         # Delete the project
-        requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/projects/delete",
-            auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-            data={"project": project_key})
+        cls.API.delete_project(project_key)
         if activate_rule:
-            # Deactivate the rule in the Quality Profile
-            requests.post(f"{cls.SONARQUBE_LOCAL_URL}/api/qualityprofiles/deactivate_rule",
-                auth=("admin", cls.SONARQUBE_ADMIN_PASSWORD),
-                data={
-                    "key": qp_key,
-                    "rule": rule_violated
-                })
+            # Delete the copy of the Quality Profile
+            cls.API.delete_quality_profile(language_key, quality_profile)
 
     # Language tests
+    @_REQUIRES_SERVER
     def test_language_c_cpp(self):
         """
         As a user of this image, I want to analyze a C/C++ project
@@ -377,6 +600,7 @@ class TestCNESSonarScanner:
         # 0 issue are expected with the Sonar way Quality Profile for
         # C++ (Community) because it does not have any rule enabled.
 
+    @_REQUIRES_SERVER
     def test_language_fortran_77(self):
         """
         As a user of this image, I want to analyze a fortran 77 project
@@ -387,6 +611,7 @@ class TestCNESSonarScanner:
         )
         self.language("Fortran 77", "f77", "fortran77", sensors, "fortran77-dummy-project", 11)
 
+    @_REQUIRES_SERVER
     def test_language_fortran_90(self):
         """
         As a user of this image, I want to analyze a fortran 90 project
@@ -397,6 +622,7 @@ class TestCNESSonarScanner:
         )
         self.language("Fortran 90", "f90", "fortran90", sensors, "fortran90-dummy-project", 14)
 
+    @_REQUIRES_SERVER
     def test_language_java(self):
         """
         As a user of this image, I want to analyze a java project
@@ -410,6 +636,7 @@ class TestCNESSonarScanner:
         )
         self.language("Java", "java", "java", sensors, "java-dummy-project", 3, "RNC A", 6)
 
+    @_REQUIRES_SERVER
     def test_language_python(self):
         """
         As a user of this image, I want to analyze a Python project
@@ -417,6 +644,7 @@ class TestCNESSonarScanner:
         """
         self.language("Python", "py", "python", (), "python-dummy-project", 3, "RNC A", 2)
 
+    @_REQUIRES_SERVER
     def test_language_shell(self):
         """
         As a user of this image, I want to analyze a shell project
@@ -427,6 +655,165 @@ class TestCNESSonarScanner:
         )
         self.language("Shell", "shell", "shell", sensors, "shell-dummy-project", 60, "RNC SHELL", 19)
 
+    # Test the batch mode
+    @_REQUIRES_SERVER
+    def test_batch_analysis(self):
+        """
+        As a user of this image, I want to analyze several projects
+        in a single container so that I do not pay its start-up for each of them.
+        """
+        projects = ("tests/fortran77", "tests/fortran90")
+        # Keys of their own, so that the projects of the language tests are not modified
+        key_suffix = self.worker_project_key("-batch")
+        output = self.run_command(
+            f"sonar-scanner-batch -Dsonar.working.directory=.scannerwork/batch-{self.WORKER_ID} \
+            -Dsonar.login={self.SONARQUBE_TOKEN}",
+            environment={
+                "SONAR_HOST_URL": self.SONARQUBE_URL,
+                "SONAR_BATCH_PROJECTS": " ".join(projects),
+                "SONAR_BATCH_JOBS": "2",
+                "SONAR_BATCH_KEY_SUFFIX": key_suffix
+            })
+        for project in projects:
+            # Hint: if this test fails, look for the log of the project in the output of the container
+            assert "SUCCESS" in next(line for line in output.split('\n') if line.endswith(f"/usr/src/{project}"))
+
+    # Test the cache of the sonar-scanner
+    @_REQUIRES_SERVER
+    def test_warm_cache(self):
+        """
+        As a user of this image, I want to fill the cache of the sonar-scanner
+        from the server so that analyses do not download the plugins.
+        """
+        output = self.run_command(f"bash -c 'sonar-cache warm {self.SONARQUBE_URL} && sonar-cache verify'",
+            stderr=True,
+            environment={"SONAR_TOKEN": self.SONARQUBE_TOKEN})
+        # Hint: if this test fails, a file downloaded from the server did not have the expected hash
+        assert "already cached, 0 failure(s)" in output
+        assert ", 0 corrupted" in output
+
+    @_REQUIRES_SERVER
+    def test_evict_cache(self):
+        """
+        As a user of this image, I want the cache of the sonar-scanner to only
+        keep the files of the server so that the caches of the CI do not grow.
+        """
+        output = self.run_command(f"bash -c 'sonar-cache warm {self.SONARQUBE_URL} \
+            && sonar-cache evict --dry-run {self.SONARQUBE_URL} && sonar-cache key {self.SONARQUBE_URL}'",
+            stderr=True,
+            environment={"SONAR_TOKEN": self.SONARQUBE_TOKEN, "SONAR_CACHE_MAX_SIZE": "1"})
+        # Hint: if this test fails, a file of the server was evicted to fit in the size budget
+        assert "beyond the size budget" not in output
+        assert "do not fit in the size budget" in output
+        assert re.search(r"^sonar-cache-[0-9a-f]{16}$", output, re.MULTILINE)
+
+    # Benchmark
+    @_REQUIRES_SERVER
+    @pytest.mark.skipif(not BENCHMARK, reason="the benchmark is only run with BENCHMARK=yes")
+    def test_benchmark(self):
+        """
+        As a maintainer of this image, I want to time the analyses and the tools
+        so that changes of the image are judged on numbers.
+        """
+        recorder = benchmark.Recorder()
+        for _ in range(self.BENCHMARK_RUNS):
+            for folder in self._BENCHMARK_LANGUAGES:
+                project_key = self.worker_project_key(f"benchmark-{folder}")
+                output, timings = self.run_timed(
+                    f"-Dsonar.projectBaseDir=/usr/src/tests/{folder} -Dsonar.projectKey={project_key} \
+                    -Dsonar.working.directory={self.scanner_work_dir(project_key)} -Dsonar.login={self.SONARQUBE_TOKEN}",
+                    environment={"SONAR_HOST_URL": self.SONARQUBE_URL},
+                    network=self.SONARQUBE_NETWORK,
+                    user="0:0",
+                    volumes={
+                        f"{self._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'rw'},
+                        f"{self._PROJECT_ROOT_DIR}/.sonarcache": {'bind': '/opt/sonar-scanner/.sonar/cache', 'mode': 'rw'}
+                    })
+                task_id = self.get_ce_task_id(f"tests/{folder}", project_key, output)
+                # Hint: if this test fails, look for the error in the background tasks of the server
+                assert self.wait_ce_task(task_id) == 'SUCCESS'
+                task = self.API.ce_task(task_id)
+                timings["ce_queue_ms"] = round(
+                    (benchmark.parse_time(task["startedAt"]) - benchmark.parse_time(task["submittedAt"])) * 1000)
+                timings["ce_processing_ms"] = task["executionTimeMs"]
+                recorder.add(f"language:{folder}", timings)
+            for tool, cmd in self._BENCHMARK_TOOLS.items():
+                _, timings = self.run_timed(cmd, user="0:0",
+                    volumes={f"{self._PROJECT_ROOT_DIR}": {'bind': '/usr/src', 'mode': 'ro'}})
+                recorder.add(f"tool:{tool}", timings)
+
+        results = recorder.results(image=self._SONAR_SCANNER_IMAGE, runs=self.BENCHMARK_RUNS)
+        benchmark.write(self.BENCHMARK_OUTPUT, results)
+        print(f"Benchmark results written to {self.BENCHMARK_OUTPUT}")
+        if os.path.exists(self.BENCHMARK_BASELINE):
+            with open(self.BENCHMARK_BASELINE, "r", encoding="utf8") as f:
+                baseline = json.load(f)
+            regressions = benchmark.compare(results, baseline, self.BENCHMARK_THRESHOLD, self.BENCHMARK_MIN_DELTA_MS)
+        else:
+            baseline, regressions = {}, []
+            print(f"No baseline ({self.BENCHMARK_BASELINE}) to compare the results with")
+        if self.BENCHMARK_UPDATE_BASELINE:
+            # Keep the thresholds of the previous baseline
+            benchmark.write(self.BENCHMARK_BASELINE, {**results, "thresholds": baseline.get("thresholds", {})})
+            print(f"Baseline {self.BENCHMARK_BASELINE} updated")
+        # Hint: if this test fails, compare the results with the baseline to find what got slower
+        assert not regressions, "\n".join(regressions)
+
+    # Test the harness
+    def test_harness_projects(self):
+        """
+        As a maintainer of this image, I want the harness to create, find and
+        delete projects on the server so that the scenarios can manage theirs.
+        """
+        project_key = self.worker_project_key("harness-dummy-project")
+        # Hint: if this test fails, the project already exists, delete it from the server
+        assert not self.API.create_project(project_key, "Harness Dummy Project")
+        # A second project with the same key is refused
+        assert self.API.create_project(project_key, "Harness Dummy Project")
+        assert self.API.search_projects(project_key)[0]['key'] == project_key
+        self.API.delete_project(project_key)
+        assert not self.API.search_projects(project_key)
+
+    def test_harness_quality_profiles(self):
+        """
+        As a maintainer of this image, I want the harness to work on a copy of
+        a Quality Profile so that the projects analysed concurrently are not affected.
+        """
+        project_key = self.worker_project_key("harness-dummy-project")
+        quality_profile = f"Sonar way ({project_key})"
+        qp_key = self.API.search_quality_profiles("Sonar way", "py")[0]['key']
+        copy_key = self.API.copy_quality_profile(qp_key, quality_profile)
+        assert copy_key != qp_key
+        self.API.activate_rule(copy_key, "python:S1481")
+        assert not self.API.create_project(project_key, "Harness Dummy Project")
+        self.API.add_project("py", project_key, quality_profile)
+        assert self.API.search_quality_profiles(quality_profile, "py")[0]['key'] == copy_key
+        self.API.delete_project(project_key)
+        self.API.delete_quality_profile("py", quality_profile)
+        profiles = self.API.get("api/qualityprofiles/search", language="py")['profiles']
+        assert quality_profile not in [profile['name'] for profile in profiles]
+
+    @pytest.mark.skipif(not SONARQUBE_STANDIN, reason="the issues and tasks come from the data of the stand-in")
+    def test_harness_analysis_results(self):
+        """
+        As a maintainer of this image, I want the harness to count the issues
+        of a project and to wait for the Compute Engine tasks so that the
+        results of the analyses are checked reliably.
+        """
+        project_key = self.worker_project_key("harness-dummy-project")
+        facets = self.API.issue_facets(project_key)
+        assert facets['statuses'] == {"OPEN": 2, "TO_REVIEW": 1, "CLOSED": 1}
+        assert self.API.issue_facets(project_key, rules="python:S1481")['total'] == 2
+        # All the pages are read
+        issues = list(self.API.iter_issues(project_key, page_size=3))
+        assert len({issue['key'] for issue in issues}) == 4
+        # Without a report-task.txt, the id of the task is read from the output of the scanner
+        output = "INFO  More about the report processing at http://sonarqube/api/ce/task?id=standin-task-success"
+        task_id = self.get_ce_task_id("tests/python", project_key, output)
+        assert task_id == "standin-task-success"
+        assert self.wait_ce_task(task_id) == 'SUCCESS'
+        assert self.wait_ce_task("standin-task-failed") == 'FAILED'
+
     # Test analysis tools
     def test_tool_cppcheck(self):
         """
@@ -438,6 +825,17 @@ class TestCNESSonarScanner:
         cmd = f"cppcheck --xml-version=2 tests/c_cpp/cppcheck/main.c --output-file={output}"
         self.analysis_tool("cppcheck", cmd, ref, output, False)
 
+    def test_tool_cppcheck_incremental(self):
+        """
+        As a user of this image, I want to run cppcheck incrementally
+        so that a second run reuses the first one and produces the same report.
+        """
+        ref = "tests/c_cpp/reference-cppcheck-results.xml"
+        output = "tests/c_cpp/tmp-cppcheck-incremental-results.xml"
+        cppcheck = f"cppcheck-incremental tests/c_cpp/cppcheck/main.c --output-file={output}"
+        cmd = f"bash -c '{cppcheck} && rm {output} && {cppcheck}'"
+        self.analysis_tool("cppcheck-incremental", cmd, ref, output, False)
+
     def test_tool_pylint(self):
         """
         As a user of this image, I want to run pylint from within a container
@@ -446,6 +844,14 @@ class TestCNESSonarScanner:
         cmd = "pylint --exit-zero -f json --rcfile=/opt/python/pylintrc_RNC2015_A_B tests/python/src/simplecaesar.py"
         self.analysis_tool("pylint", cmd, "tests/python/reference-pylint-results.json", "tests/python/tmp-pylint-results.json")
 
+    def test_tool_pylint_parallel(self):
+        """
+        As a user of this image, I want to run pylint on several processes
+        so that it produces the same report as a single pylint.
+        """
+        cmd = "pylint-parallel --output-format=json --rcfile=/opt/python/pylintrc_RNC2015_A_B -- tests/python/src/simplecaesar.py"
+        self.analysis_tool("pylint-parallel", cmd, "tests/python/reference-pylint-results.json", "tests/python/tmp-pylint-parallel-results.json")
+
     def test_tool_shellcheck(self):
         """
         As a user of this image, I want to run shellcheck from within a container
@@ -454,6 +860,27 @@ class TestCNESSonarScanner:
         cmd = "bash -c 'shellcheck -s sh -f checkstyle tests/shell/src/script.sh || true'"
         self.analysis_tool("shellcheck", cmd, "tests/shell/reference-shellcheck-results.xml", "tests/shell/tmp-shellcheck-results.xml")
 
+    def test_tool_lint_cache(self):
+        """
+        As a user of this image, I want the results of shellcheck to be cached
+        so that the report of a second run is the same without analysing the files again.
+        """
+        lint = "lint-cache shellcheck -s sh -- tests/shell/src/script.sh"
+        cmd = f"bash -c '{lint} > /dev/null && {lint}'"
+        self.analysis_tool("lint-cache", cmd, "tests/shell/reference-shellcheck-results.xml", "tests/shell/tmp-lint-cache-results.xml")
+
+    def test_tool_external_issues(self):
+        """
+        As a user of this image, I want the report of shellcheck to be converted
+        to a generic external issues report so that it can be imported in SonarQube.
+        """
+        output = "tests/shell/tmp-external-issues.json"
+        # The paths of the reports are relative to the base directory of the project, not to the working directory
+        report = "tests/shell/tmp-external-issues-shellcheck.xml"
+        cmd = f"bash -c \"sed 's|tests/shell/||' tests/shell/reference-shellcheck-results.xml > {report} \
+            && external-issues -o {output} --base-dir tests/shell shellcheck:{report}\""
+        self.analysis_tool("external-issues", cmd, "tests/shell/reference-external-issues.json", output, False)
+
     def test_tool_hadolint(self):
         """
         As a user of this image, I want to run hadolint from within a container
@@ -462,7 +889,25 @@ class TestCNESSonarScanner:
         cmd = "hadolint -f sonarqube --no-fail tests/docker/src/Dockerfile"
         self.analysis_tool("hadolint", cmd, "tests/docker/reference-hadolint-results.json", "tests/docker/tmp-hadolint-results.json")
 
+    def test_governor(self):
+        """
+        As a user of this image, I want the CPUs and the memory of the container
+        to be shared between the analyses, the tools and the JVM that run at the
+        same time so that they neither leave them unused nor overcommit them.
+        """
+        output = self.run_command("python3 -m container_limits governor --batch --tools pylint,shellcheck,cppcheck",
+            environment={"SONAR_GOVERNOR_CPUS": "8", "SONAR_GOVERNOR_MEMORY": "4096", "PYLINT_JOBS": "3"})
+        # Hint: if this test fails, look at the settings printed by the governor
+        assert output.split("\n") == [
+            "SONAR_BATCH_JOBS=4",
+            "PYLINT_JOBS=3",
+            "CPPCHECK_JOBS=1",
+            "SONAR_SCANNER_OPTS=-Xmx512m -XX:ActiveProcessorCount=2 -XX:+UseParallelGC -XX:ParallelGCThreads=2",
+            ""
+        ]
+
     # Test importation of analysis results
+    @_REQUIRES_SERVER
     def test_import_cppcheck_results(self):
         """
         As a user of this image, I want to be able to import the results
@@ -474,6 +919,7 @@ class TestCNESSonarScanner:
         self.import_analysis_results("CppCheck Dummy Project", "cppcheck-dummy-project",
             "RNC CPP A", "cxx", "tests/c_cpp", "cppcheck", rule_violated, expected_sensor, expected_import)
 
+    @_REQUIRES_SERVER
     def test_import_pylint_results(self):
         """
         As a user of this image, I want to be able to import the results
@@ -485,6 +931,7 @@ class TestCNESSonarScanner:
         self.import_analysis_results("Pylint Dummy Project", "pylint-dummy-project",
             "Sonar way", "py", "tests/python", "src", rule_violated, expected_sensor, expected_import)
         
+    @_REQUIRES_SERVER
     def test_import_hadolint_results(self):
         """
         As a user of this image, I want to be able to import the results
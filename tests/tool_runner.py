@@ -0,0 +1,107 @@
+"""
+Long-lived container of the image in which the commands of the tests are run
+
+Running a new container for each command pays its creation, the setup of
+its bind mounts and its removal. The harness starts a single container per
+worker process instead, with the project and the cache of the sonar-scanner
+mounted, and executes each command in it (``docker exec``). The scenarios
+are isolated by their working directories (e.g. the working directory of
+the sonar-scanner of each project), not by their containers.
+"""
+
+import shlex
+import statistics
+import time
+from typing import NamedTuple, Optional
+
+import docker
+
+# Entrypoint of the image, executed commands do not go through it otherwise
+ENTRYPOINT = "/usr/bin/entrypoint.sh"
+
+
+class CommandResult(NamedTuple):
+    """
+    Result of a command executed in the container
+    """
+    exit_code: int
+    output: str
+    errors: str
+    duration: float
+
+
+class ToolRunner:
+    """
+    Container of the image kept running for the commands of the tests.
+
+    :param docker_client: Docker client
+    :param image: image to run
+    :param volumes: volumes of the container (as for ``containers.run``)
+    :param network: (optional) network of the container, e.g. the one of the SonarQube server
+    :param user: (optional) user of the container and of the commands, default: root
+
+    Example (not a doctest):
+        runner = ToolRunner(docker.from_env(), "lequal/sonar-scanner-catlab",
+            {"/path/to/project": {'bind': '/usr/src', 'mode': 'rw'}})
+        runner.start()
+        result = runner.run("pylint --version")
+        runner.stop()
+    """
+
+    def __init__(self, docker_client: docker.DockerClient, image: str, volumes: dict,
+        network: Optional[str] = None, user: str = "0:0"):
+        self.docker_client = docker_client
+        self.image = image
+        self.volumes = volumes
+        self.network = network
+        self.user = user
+        self.container = None
+        # List of (command, duration in seconds)
+        self.durations = []
+
+    def start(self):
+        """
+        Start the container, it waits for commands until it is stopped
+        """
+        self.container = self.docker_client.containers.run(self.image, "sleep infinity",
+            detach=True,
+            network=self.network,
+            user=self.user,
+            volumes=self.volumes)
+
+    def stop(self):
+        """
+        Remove the container
+        """
+        if self.container is not None:
+            self.container.remove(force=True)
+            self.container = None
+
+    def run(self, cmd: str, environment: dict = None, workdir: str = None) -> CommandResult:
+        """
+        Execute a command in the container, as the image would run it
+        (through its entrypoint).
+
+        :param cmd: command, split as by ``containers.run``
+        :param environment: (optional) environment variables of the command
+        :param workdir: (optional) working directory of the command, default: the one of the image
+        :returns: exit code, standard output, standard error and duration of the command
+        """
+        start = time.perf_counter()
+        exit_code, (output, errors) = self.container.exec_run([ENTRYPOINT] + shlex.split(cmd),
+            environment=environment,
+            workdir=workdir,
+            user=self.user,
+            demux=True)
+        duration = time.perf_counter() - start
+        self.durations.append((cmd, duration))
+        return CommandResult(exit_code, (output or b"").decode("utf-8"), (errors or b"").decode("utf-8"), duration)
+
+    def duration_report(self) -> str:
+        """
+        :returns: the number of commands executed, their median and maximum duration
+        """
+        if not self.durations:
+            return "no command"
+        durations = [duration for _, duration in self.durations]
+        return f"{len(durations)} commands, median {statistics.median(durations):.1f}s, max {max(durations):.1f}s"